@@ -0,0 +1,3 @@
+"""Unmodified copies of trans_helper/munkres.py and trans_helper/translation_helper.py as of the first
+commit, before any of the optimizations. benchmarks/differential.py uses them as the reference
+implementations. Do not edit them; they must keep the original behavior and speed."""
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+
+"""Differential test and benchmark of the optimized engines of trans_helper.
+
+Runs the original implementation from benchmarks/baseline (an unmodified copy of
+the code before the optimizations) and the optimized engine that replaces it on
+the same randomly generated (fuzzed) inputs and optionally on real files, and
+fails if an output differs or if the optimized engine is not at least the given
+factor faster:
+
+  parser   original zusi2pot vs. the chunked multi-process reader and
+           write_po(); the output must be identical. Decoding whole chunks
+           instead of single lines makes the reader faster even on one CPU
+  weights  original ShortcutGroupFile.get_min_shortcut_weight() for each
+           character vs. get_min_shortcut_weights(); the weights must be
+           identical
+  solver   original munkres.Munkres vs. assignment.solve(); the total cost of
+           both assignments must be equal (both are optimal, but ties may be
+           broken differently)
+  writer   original po2zusi vs. the current po2zusi (master index, shortcut
+           generation and streaming writer); the output must be identical"""
+
+import argparse
+import codecs
+import contextlib
+import io
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.baseline import munkres as baseline_munkres
+from benchmarks.baseline import translation_helper as baseline_helper
+from trans_helper import assignment, cli, munkres, parallel, translation_helper
+
+# The original translation_helper enables info logging on import
+logging.getLogger().setLevel(logging.WARNING)
+
+WORDS = ['Datei', 'Strecke', 'Öffnen', 'Signal', 'Fahrplan', 'Zug', 'Gleis', 'Weiche', 'Einfügen',
+    'Speichern', 'x', '1', '(2)', 'Tipp', 'Trick', '-', '+']
+
+def random_text(rng):
+  """Returns a source text with the things that are easy to get wrong: shortcuts, escaped ampersands,
+  quotes, spaces, non-ASCII characters and ' = ' inside the text."""
+  words = [rng.choice(WORDS) for i in range(rng.randint(0, 6))]
+  for i in range(len(words)):
+    r = rng.random()
+    if r < 0.15:
+      pos = rng.randint(0, len(words[i]))
+      words[i] = words[i][:pos] + '&' + words[i][pos:]
+    elif r < 0.25:
+      words[i] += ' &&'
+    elif r < 0.28:
+      words[i] += ' = '
+  text = ' '.join(words)
+  if rng.random() < 0.2:
+    text = "'" + text
+  if rng.random() < 0.2:
+    text += "'"
+  return ' ' * rng.choice([0, 0, 0, 1, 3]) + text + ' ' * rng.choice([0, 0, 0, 2])
+
+def random_zusi_file(rng, num_entries, duplicate_keys=True):
+  """Returns the content of a Zusi file with duplicate keys (if duplicate_keys is true), 'Streckenvorschau'
+  keys, lines that are not entries and mixed line endings."""
+  keys = []
+  lines = []
+  for i in range(num_entries):
+    r = rng.random()
+    if r < 0.05 and keys and duplicate_keys:
+      key = rng.choice(keys) # duplicate key
+    elif r < 0.1:
+      key = 'Streckenvorschau.Label%d.Caption' % i
+    else:
+      key = 'Form%d.Control%d.%s' % (i // 20, i, rng.choice(['Caption', 'Hint', 'Text', 'Items']))
+    keys.append(key)
+    lines.append(key + ' = ' + random_text(rng))
+    if rng.random() < 0.02:
+      lines.append(rng.choice(['', '; comment', '[Section]', 'no separator']))
+  return ''.join(line + rng.choice(['\r\n', '\r\n', '\r\n', '\n']) for line in lines)
+
+def zusi2pot(master_file):
+  out = io.StringIO()
+  translation_helper.write_po(out, 'zusi2pot', master_file, translation_helper.TranslationFile())
+  return out.getvalue()
+
+def read_output(name):
+  with open(name, encoding='UTF-8', newline='') as f:
+    return f.read()
+
+class BaselineOutput(object):
+  """Deferred output file (--out) of the original code, closed when the given ExitStack is."""
+  def __init__(self, stack, name):
+    self.stack = stack
+    self.name = name
+
+  def open(self):
+    return self.stack.enter_context(codecs.open(self.name, 'w', 'UTF-8'))
+
+def run_baseline(mode, out, master, po_file=None, shortcut_groups=None):
+  """Runs the original TranslationHelper.main() for the given file names (UTF-8) and returns the content of
+  the output file, or None if it raised a TranslationException."""
+  with contextlib.ExitStack() as stack:
+    def open_file(name):
+      return None if name is None else stack.enter_context(codecs.open(name, 'r', 'UTF-8'))
+    args = argparse.Namespace(mode=mode, master=[[open_file(master)]], context=None, translation=None,
+        po_file=open_file(po_file), shortcut_groups=open_file(shortcut_groups), out=BaselineOutput(stack, out),
+        strip_shortcuts=None)
+    try:
+      baseline_helper.TranslationHelper().main(args)
+    except baseline_helper.TranslationException:
+      return None
+  return read_output(out)
+
+class ParserCheck(object):
+  name = 'parser'
+  min_speedup = 1.0
+
+  def __init__(self, jobs):
+    self.jobs = jobs
+    self.files = []
+
+  def generate(self, rng, size, real_files):
+    self.files = list(real_files)
+    self.temp_dir = tempfile.TemporaryDirectory()
+    # Small files with many chunks for the chunk boundaries, and a large file for the speed
+    for (i, num_entries) in enumerate([size * 20, size * 20, size * 20, size * 500]):
+      name = os.path.join(self.temp_dir.name, 'fuzz%d.txt' % i)
+      with open(name, 'w', encoding='UTF-8', newline='') as f:
+        f.write(random_zusi_file(rng, num_entries))
+      self.files.append(name)
+
+  def reference(self):
+    return [run_baseline('zusi2pot', os.path.join(self.temp_dir.name, 'out.pot'), name) for name in self.files]
+
+  def candidate(self):
+    return [zusi2pot(parallel.read_from_zusi_parallel(name, 'UTF-8', {}, jobs=self.jobs,
+        min_chunk_size=max(1, os.path.getsize(name) // (4 * self.jobs)))) for name in self.files]
+
+  def compare(self, expected, actual):
+    for (name, e, a) in zip(self.files, expected, actual):
+      if e != a:
+        return "zusi2pot output differs for %s" % name
+    return None
+
+class WeightsCheck(object):
+  name = 'weights'
+  min_speedup = 1.0
+
+  def generate(self, rng, size, real_files):
+    shortcuts = translation_helper.ShortcutGroupFile()
+    texts = []
+    for name in real_files:
+      with codecs.open(name, 'r', 'UTF-8') as f:
+        texts.extend(entry.value for entry in translation_helper.iter_zusi(f, {}))
+    texts.extend(random_text(rng) for i in range(size * 20))
+    self.rows = []
+    for text in texts:
+      source_shortcut = shortcuts.get_shortcut(text) or rng.choice(translation_helper.shortcut_letters + '12(')
+      existing_shortcut = rng.choice([None, None, rng.choice(text.lower() or 'a')])
+      self.rows.append((text.lower(), source_shortcut, existing_shortcut))
+    self.shortcuts = shortcuts
+    self.baseline_shortcuts = baseline_helper.ShortcutGroupFile()
+
+  def reference(self):
+    return [dict((c, self.baseline_shortcuts.get_min_shortcut_weight(text, c, source_shortcut, existing_shortcut))
+        for c in set(text)) for (text, source_shortcut, existing_shortcut) in self.rows]
+
+  def candidate(self):
+    return [self.shortcuts.get_min_shortcut_weights(text, source_shortcut, existing_shortcut)
+        for (text, source_shortcut, existing_shortcut) in self.rows]
+
+  def compare(self, expected, actual):
+    for (row, e, a) in zip(self.rows, expected, actual):
+      if e != a:
+        return "weights differ for %r: %r != %r" % (row, e, a)
+    return None
+
+class SolverCheck(object):
+  name = 'solver'
+  min_speedup = 1.0
+
+  def generate(self, rng, size, real_files):
+    """Cost matrices like those of shortcut groups: at most one row per letter, most letters do not occur
+    in a text, and every row can get a different letter."""
+    self.matrices = []
+    for i in range(size):
+      rows = rng.randint(2, 26)
+      columns = rng.randint(rows, 30)
+      matrix = [[rng.randint(0, 1300) if rng.random() < 0.3 else assignment.INFEASIBLE for j in range(columns)]
+          for i in range(rows)]
+      for (row, j) in zip(matrix, rng.sample(range(columns), rows)):
+        row[j] = rng.randint(0, 1300)
+      self.matrices.append(matrix)
+
+  def reference(self):
+    solver = baseline_munkres.Munkres()
+    return [sum(matrix[i][j] for (i, j) in solver.compute(matrix)) for matrix in self.matrices]
+
+  def candidate(self):
+    solver = munkres.Munkres()
+    return [sum(matrix[i][j] for (i, j) in assignment.solve(matrix, solver=solver, memo=None))
+        for matrix in self.matrices]
+
+  def compare(self, expected, actual):
+    for (matrix, e, a) in zip(self.matrices, expected, actual):
+      if e != a:
+        return "assignment cost differs (%d != %d) for %r" % (e, a, matrix)
+    return None
+
+TRANSLATED_WORDS = ['File', 'Route', 'Open', 'Signal', 'Timetable', 'Train', 'Track', 'Switch', 'Insert',
+    'Save', 'Vue', 'Fichier', 'Ouvrir', 'Ligne', 'Élément', 'Tip', '2', '(x)', '&&']
+
+class WriterCheck(object):
+  name = 'writer'
+  min_speedup = 1.0
+
+  def generate(self, rng, size, real_files):
+    """A master file without duplicate keys (the original code breaks ties between entries of the same key
+    in the order of a set), a PO file that translates every text and a shortcut group for the captions and
+    texts of each form."""
+    self.temp_dir = tempfile.TemporaryDirectory()
+    self.master = os.path.join(self.temp_dir.name, 'master.txt')
+    self.po_file = os.path.join(self.temp_dir.name, 'translation.po')
+    self.shortcut_groups = os.path.join(self.temp_dir.name, 'groups.txt')
+    self.reference_out = os.path.join(self.temp_dir.name, 'reference.txt')
+    self.out = os.path.join(self.temp_dir.name, 'out.txt')
+    with open(self.master, 'w', encoding='UTF-8', newline='') as f:
+      f.write(random_zusi_file(rng, size * 20, duplicate_keys=False))
+    with codecs.open(self.master, 'r', 'UTF-8') as f:
+      master_file = translation_helper.TranslationFile().read_from_zusi(f, {})
+
+    translations = {}
+    with open(self.po_file, 'w', encoding='UTF-8', newline='') as f:
+      f.write('msgid ""\r\nmsgstr ""\r\n"Content-Type: text/plain; charset=UTF-8\\n"\r\n\r\n')
+      for entry in master_file:
+        if entry.value == '':
+          continue
+        if entry.value not in translations:
+          translations[entry.value] = ' '.join(rng.sample(TRANSLATED_WORDS, rng.randint(2, 4)))
+        f.write('#. :src: %s\r\nmsgid "%s"\r\nmsgstr "%s"\r\n\r\n' % (entry.key,
+            translation_helper.escape_po(entry.value), translation_helper.escape_po(translations[entry.value])))
+
+    # Like the real shortcut group files, one group per form (dialog) with the captions and texts of its controls
+    groups = {}
+    for entry in master_file:
+      if entry.key.startswith('Form') and ('Caption' in entry.key or 'Text' in entry.key):
+        groups.setdefault(entry.key.split('.', 1)[0], []).append(entry.key)
+    with open(self.shortcut_groups, 'w', encoding='UTF-8', newline='') as f:
+      for (form, keys) in groups.items():
+        keys.append(form + '.Unknown.Caption')
+        f.write(''.join(key + '\r\n' for key in keys) + '\r\n')
+
+  def reference(self):
+    return run_baseline('po2zusi', self.reference_out, self.master, self.po_file, self.shortcut_groups)
+
+  def candidate(self):
+    args = cli.parse_args(['po2zusi', '-m', self.master, '-p', self.po_file, '-s', self.shortcut_groups,
+        '-o', self.out])
+    try:
+      translation_helper.TranslationHelper().main(args)
+    except translation_helper.TranslationException:
+      return None
+    finally:
+      for f in [args.master[0][0], args.po_file, args.shortcut_groups]:
+        f.close()
+    return read_output(self.out)
+
+  def compare(self, expected, actual):
+    if expected != actual:
+      if expected is None or actual is None:
+        return "only one of the implementations failed to generate shortcuts"
+      for (e, a) in zip(expected.splitlines(), actual.splitlines()):
+        if e != a:
+          return "po2zusi output differs: %r != %r" % (e, a)
+      return "po2zusi output differs in length"
+    return None
+
+def timed(function):
+  start = time.perf_counter()
+  result = function()
+  return (result, time.perf_counter() - start)
+
+def main():
+  parser = argparse.ArgumentParser(description='Differential test and benchmark of the optimized engines of trans_helper.')
+  parser.add_argument('--seed', type=int, default=1, help='Random seed of the fuzzer')
+  parser.add_argument('--rounds', type=int, default=5, help='Number of rounds with new random inputs')
+  parser.add_argument('--size', type=int, default=200, help='Size of the random inputs of one round')
+  parser.add_argument('--master', action='append', default=[], metavar='FILE',
+      help='Real Zusi file (UTF-8) that is used as input of the parser and weights checks')
+  parser.add_argument('--jobs', type=int, default=2, help='Number of worker processes of the parallel parser')
+  parser.add_argument('--min-speedup', action='append', default=[], metavar='CHECK=FACTOR',
+      help='Minimum speedup of the optimized engine of a check (default: 1 for all checks)')
+  parser.add_argument('--check', action='append', choices=['parser', 'weights', 'solver', 'writer'],
+      help='Only run the given checks')
+  args = parser.parse_args()
+
+  checks = [ParserCheck(args.jobs), WeightsCheck(), SolverCheck(), WriterCheck()]
+  for setting in args.min_speedup:
+    (name, factor) = setting.split('=', 1)
+    for check in checks:
+      if check.name == name:
+        check.min_speedup = float(factor)
+  if args.check:
+    checks = [check for check in checks if check.name in args.check]
+
+  rng = random.Random(args.seed)
+  failed = False
+  print("%-8s %12s %12s %8s %8s" % ("Check", "Reference", "Optimized", "Speedup", "Minimum"))
+  for check in checks:
+    reference_time = 0.0
+    candidate_time = 0.0
+    for i in range(args.rounds):
+      check.generate(rng, args.size, args.master)
+      (expected, t) = timed(check.reference)
+      reference_time += t
+      (actual, t) = timed(check.candidate)
+      candidate_time += t
+      error = check.compare(expected, actual)
+      if error is not None:
+        print("%s: output mismatch in round %d (seed %d): %s" % (check.name, i + 1, args.seed, error))
+        failed = True
+        break
+    speedup = reference_time / candidate_time if candidate_time > 0 else float('inf')
+    print("%-8s %10.1f ms %10.1f ms %7.2fx %7.2fx" % (check.name, reference_time * 1000, candidate_time * 1000,
+        speedup, check.min_speedup))
+    if speedup < check.min_speedup:
+      print("%s: optimized engine is too slow" % check.name)
+      failed = True
+
+  if failed:
+    sys.exit(1)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+"""Startup time benchmark for trans_helper.py.
+
+Runs the no-op path (checkzusi on a small master file) several times with
+python -X importtime and fails if the median wall time or the cumulative
+import time exceeds the given budget.
+
+The default budgets are relative to the median wall time of a bare
+interpreter (python -X importtime -c pass) on the same machine, so that they
+do not depend on the speed of the machine. Absolute budgets in milliseconds
+can be given as well."""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, 'trans_helper.py')
+
+def parse_importtime(stderr):
+  """Returns a dict module -> cumulative import time in microseconds for the top-level imports
+  done by trans_helper (i.e. not by the interpreter startup)."""
+  result = {}
+  for line in stderr.splitlines():
+    if not line.startswith('import time:'):
+      continue
+    fields = line[len('import time:'):].split('|')
+    if len(fields) != 3 or not fields[1].strip().isdigit():
+      continue
+    name = fields[2][1:].rstrip()
+    if name.startswith('  '):
+      continue # imported by another module, already contained in its cumulative time
+    if name.startswith('trans_helper') or len(result):
+      result[name] = int(fields[1])
+  return result
+
+def run_once(master):
+  start = time.perf_counter()
+  proc = subprocess.run([sys.executable, '-X', 'importtime', SCRIPT, 'checkzusi', '--master', master],
+      stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+  return (time.perf_counter() - start) * 1000, parse_importtime(proc.stderr)
+
+def run_baseline():
+  start = time.perf_counter()
+  subprocess.run([sys.executable, '-X', 'importtime', '-c', 'pass'],
+      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+  return (time.perf_counter() - start) * 1000
+
+def main():
+  parser = argparse.ArgumentParser(description='Startup time benchmark for the no-op path of trans_helper.py.')
+  parser.add_argument('--runs', type=int, default=20, help='Number of runs')
+  parser.add_argument('--budget', type=float, default=4.5, metavar='FACTOR',
+      help='Maximum median wall time of one invocation relative to a bare interpreter (default: 4.5)')
+  parser.add_argument('--import-budget', type=float, default=3.0, metavar='FACTOR',
+      help='Maximum median time spent importing trans_helper and the modules it needs relative to '
+      + 'the wall time of a bare interpreter (default: 3)')
+  parser.add_argument('--budget-ms', type=float,
+      help='Maximum median wall time of one invocation in milliseconds')
+  parser.add_argument('--import-budget-ms', type=float,
+      help='Maximum median time spent importing trans_helper and the modules it needs in milliseconds')
+  args = parser.parse_args()
+
+  with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+    f.write("Form.Caption = &Datei\r\nForm.Hint = Tipp && Trick\r\n")
+  try:
+    wall_times = []
+    import_times = []
+    baseline_times = []
+    slowest = {}
+    for i in range(args.runs):
+      baseline_times.append(run_baseline())
+      (wall_time, imports) = run_once(f.name)
+      wall_times.append(wall_time)
+      import_times.append(sum(imports.values()) / 1000.0)
+      for (name, t) in imports.items():
+        slowest[name] = max(slowest.get(name, 0), t)
+  finally:
+    os.unlink(f.name)
+
+  baseline = statistics.median(baseline_times)
+  wall_time = statistics.median(wall_times)
+  import_time = statistics.median(import_times)
+  budget = args.budget * baseline if args.budget_ms is None else min(args.budget * baseline, args.budget_ms)
+  import_budget = args.import_budget * baseline if args.import_budget_ms is None \
+      else min(args.import_budget * baseline, args.import_budget_ms)
+  print("Bare interpreter:   %7.1f ms" % baseline)
+  print("Median wall time:   %7.1f ms (%.1fx, budget %.1f ms)" % (wall_time, wall_time / baseline, budget))
+  print("Median import time: %7.1f ms (%.1fx, budget %.1f ms)" % (import_time, import_time / baseline, import_budget))
+  print("Slowest top-level imports:")
+  for (name, t) in sorted(slowest.items(), key=lambda item: -item[1])[:10]:
+    print("  %7.1f ms  %s" % (t / 1000.0, name))
+
+  if wall_time > budget or import_time > import_budget:
+    print("Startup time budget exceeded")
+    sys.exit(1)
+
+if __name__ == '__main__':
+  main()
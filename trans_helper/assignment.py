@@ -0,0 +1,245 @@
+"""Helpers for solving the shortcut assignment problem with the Munkres algorithm."""
+
+import hashlib
+import logging
+import time
+from array import array
+from collections import OrderedDict, defaultdict
+
+from . import munkres
+
+# Cost of assigning a letter that does not occur in a text
+INFEASIBLE = 9999
+
+# Maximum number of solutions kept by the module-level memo and of group assignments kept by the
+# shortcut caches of long-running watchers and sessions
+MEMO_SIZE = 10000
+
+class LRUCache(object):
+  """Mapping that keeps at most max_size items; when it is full, the least recently used item is dropped."""
+
+  def __init__(self, max_size=MEMO_SIZE):
+    self.max_size = max_size
+    self.items = OrderedDict()
+
+  def __getitem__(self, key):
+    value = self.items[key]
+    self.items.move_to_end(key)
+    return value
+
+  def __setitem__(self, key, value):
+    self.items[key] = value
+    self.items.move_to_end(key)
+    if len(self.items) > self.max_size:
+      self.items.popitem(last=False)
+
+  def __contains__(self, key):
+    return key in self.items
+
+  def __len__(self):
+    return len(self.items)
+
+  def clear(self):
+    self.items.clear()
+
+class AssignmentMemo(object):
+  """Solutions of assignment problems that were already solved, keyed by a digest of the cost matrix.
+  Groups of untranslated or identical texts produce identical cost matrices in many languages, so the
+  module-level instance 'memo' is shared by all shortcut groups and languages solved in one process.
+  It keeps at most max_size solutions, so that it does not grow without bound in long-running processes."""
+
+  def __init__(self, max_size=MEMO_SIZE):
+    self.solutions = LRUCache(max_size)
+    self.hits = 0
+    self.misses = 0
+
+  def key(self, matrix, mode):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(("%s:%d:%d:" % (mode, len(matrix), len(matrix[0]) if len(matrix) else 0)).encode('ascii'))
+    for row in matrix:
+      h.update(array('l', row).tobytes())
+    return h.digest()
+
+  def get(self, key):
+    try:
+      result = self.solutions[key]
+    except KeyError:
+      self.misses += 1
+      return None
+    self.hits += 1
+    return result
+
+  def put(self, key, indexes):
+    self.solutions[key] = indexes
+
+  def clear(self):
+    self.solutions.clear()
+    self.hits = 0
+    self.misses = 0
+
+  def log_statistics(self):
+    logging.info("Assignment memo: {} hit(s), {} miss(es), {} solution(s) stored".format(
+        self.hits, self.misses, len(self.solutions)))
+
+memo = AssignmentMemo()
+
+def connected_components(matrix, infeasible=INFEASIBLE):
+  """Splits the bipartite graph "row can use column" (cost < infeasible) of the given cost matrix into
+  connected components. Returns a list of tuples (row indexes, column indexes). Columns that no row can use
+  are omitted; rows that cannot use any column form a component with an empty column list."""
+  num_rows = len(matrix)
+  parent = list(range(num_rows + (len(matrix[0]) if num_rows else 0)))
+
+  def find(x):
+    while parent[x] != x:
+      parent[x] = parent[parent[x]]
+      x = parent[x]
+    return x
+
+  for (i, row) in enumerate(matrix):
+    for (j, cost) in enumerate(row):
+      if cost < infeasible:
+        a = find(i)
+        b = find(num_rows + j)
+        if a != b:
+          parent[b] = a
+
+  components = defaultdict(lambda: ([], []))
+  for i in range(num_rows):
+    components[find(i)][0].append(i)
+  for j in range(num_rows, len(parent)):
+    root = find(j)
+    if root in components and root != j:
+      components[root][1].append(j - num_rows)
+  return [components[root] for root in sorted(components.keys())]
+
+def _augment(start, feasible_columns, column_of_row, row_of_column):
+  """Assigns a column to the unassigned row start by moving other rows along an augmenting path
+  (breadth-first, preferring cheap columns). Returns False if there is no such path."""
+  parent = {} # column -> row from which it was reached
+  queue = [start]
+  for i in queue:
+    for j in feasible_columns[i]:
+      if j in parent:
+        continue
+      parent[j] = i
+      k = row_of_column[j]
+      if k >= 0:
+        queue.append(k)
+        continue
+      while True:
+        i = parent[j]
+        previous = column_of_row[i]
+        column_of_row[i] = j
+        row_of_column[j] = i
+        if i == start:
+          return True
+        j = previous
+  return False
+
+def solve_approximate(matrix, infeasible=INFEASIBLE, time_budget=1.0):
+  """Computes an assignment for the given cost matrix without the O(n^3) Munkres algorithm:
+  entries are assigned greedily in ascending cost order, rows that are left without a column are repaired
+  with augmenting paths, and the result is improved by moving rows to cheaper free columns and swapping
+  the columns of two rows until no move improves the cost or the time budget (in seconds) is used up.
+
+  Returns a tuple (list of (row, column) tuples, total cost, lower bound of the optimal total cost).
+  Rows that cannot be assigned to a feasible column are not contained in the result."""
+  deadline = time.time() + time_budget
+  num_rows = len(matrix)
+  num_columns = len(matrix[0]) if num_rows else 0
+  column_of_row = [-1] * num_rows
+  row_of_column = [-1] * num_columns
+
+  # Feasible columns of each row, cheapest first
+  feasible_columns = []
+  for row in matrix:
+    feasible_columns.append(sorted([j for j in range(num_columns) if row[j] < infeasible], key=row.__getitem__))
+
+  for (cost, i, j) in sorted((matrix[i][j], i, j) for i in range(num_rows) for j in feasible_columns[i]):
+    if column_of_row[i] < 0 and row_of_column[j] < 0:
+      column_of_row[i] = j
+      row_of_column[j] = i
+
+  for i in range(num_rows):
+    if column_of_row[i] < 0:
+      _augment(i, feasible_columns, column_of_row, row_of_column)
+
+  improved = True
+  while improved and time.time() < deadline:
+    improved = False
+    for i in range(num_rows):
+      a = column_of_row[i]
+      if a < 0:
+        continue
+      row = matrix[i]
+      for j in feasible_columns[i]:
+        if row[j] >= row[a]:
+          break
+        k = row_of_column[j]
+        if k < 0:
+          row_of_column[a] = -1
+        elif row[j] + matrix[k][a] < row[a] + matrix[k][j]:
+          column_of_row[k] = a
+          row_of_column[a] = k
+        else:
+          continue
+        column_of_row[i] = j
+        row_of_column[j] = i
+        improved = True
+        break
+
+  result = [(i, column_of_row[i]) for i in range(num_rows) if column_of_row[i] >= 0]
+  cost = sum(matrix[i][j] for (i, j) in result)
+  lower_bound = sum(min(row) for row in matrix)
+  return (result, cost, lower_bound)
+
+def solve(matrix, infeasible=INFEASIBLE, solver=None, approximate_threshold=None, time_budget=1.0, memo=memo):
+  """Returns a list of (row, column) tuples describing a lowest-cost assignment for the given cost matrix.
+
+  Rows and columns that cannot be assigned to each other (cost >= infeasible) never interact, so each
+  connected component of the matrix is solved on its own, which gives the same total cost as solving the
+  whole matrix at once as long as every row can be assigned to a column. Rows for which this is not possible
+  are either assigned to an infeasible column or not contained in the result.
+
+  Components with at least approximate_threshold rows are solved with solve_approximate() instead of the
+  Munkres algorithm, using at most time_budget seconds each.
+
+  Solutions of components are looked up in and stored to the given AssignmentMemo (None to disable)."""
+  if solver is None:
+    solver = munkres.Munkres()
+
+  result = []
+  for (rows, columns) in connected_components(matrix, infeasible):
+    if not len(columns):
+      continue
+    if len(rows) == 1:
+      row = matrix[rows[0]]
+      result.append((rows[0], min(columns, key=lambda j: row[j])))
+      continue
+    if len(rows) == len(matrix) and len(columns) == len(matrix[0]):
+      submatrix = matrix # the solver does not modify it
+    elif isinstance(matrix[0], array):
+      # Compact rows stay compact
+      submatrix = [array(matrix[i].typecode, [matrix[i][j] for j in columns]) for i in rows]
+    else:
+      submatrix = [[matrix[i][j] for j in columns] for i in rows]
+    approximate = approximate_threshold is not None and len(rows) >= approximate_threshold
+    key = None
+    indexes = None
+    if memo is not None:
+      # The compact solver may break ties differently than the list solver, so their solutions are kept apart
+      key = memo.key(submatrix, 'approximate' if approximate else 'exact-compact' if solver.compact else 'exact')
+      indexes = memo.get(key)
+    if indexes is None:
+      if approximate:
+        (indexes, cost, lower_bound) = solve_approximate(submatrix, infeasible, time_budget)
+        logging.info("Approximate shortcut assignment for {} entries: cost {}, lower bound {}, gap at most {:.1%}".format(
+            len(rows), cost, lower_bound, float(cost - lower_bound) / lower_bound if lower_bound else 0.0))
+      else:
+        indexes = solver.compute(submatrix)
+      if memo is not None:
+        memo.put(key, indexes)
+    for (r, c) in indexes:
+      result.append((rows[r], columns[c]))
+  return sorted(result)
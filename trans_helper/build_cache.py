@@ -0,0 +1,134 @@
+import hashlib
+import json
+import logging
+import os
+
+def file_digest(filename):
+  h = hashlib.sha256()
+  with open(filename, 'rb') as f:
+    for block in iter(lambda: f.read(1 << 16), b''):
+      h.update(block)
+  return h.hexdigest()
+
+def tool_version():
+  """Digest of the trans_helper sources, so that any change to the tool invalidates the cache."""
+  h = hashlib.sha256()
+  package_dir = os.path.dirname(os.path.abspath(__file__))
+  for name in sorted(os.listdir(package_dir)):
+    if name.endswith('.py'):
+      h.update(name.encode('utf-8'))
+      with open(os.path.join(package_dir, name), 'rb') as f:
+        h.update(f.read())
+  return h.hexdigest()
+
+class BuildCache(object):
+  """Content-addressed cache that skips a run when all of its inputs (file contents, encodings, flags and
+  the tool version) are unchanged since the output file was last generated, and the output file still has
+  the content that was generated back then.
+
+  There is one manifest file per output file in the cache directory, so parallel runs that write different
+  output files can share a cache directory."""
+
+  def __init__(self, directory):
+    self.directory = directory
+    self.hits = []
+    self.misses = []
+    self._tool_version = None
+
+  def input_digest(self, args, memory_digest=None):
+    """Returns the digest of the inputs of a run, given the digest of its --memory file (see memory_digest())."""
+    if self._tool_version is None:
+      self._tool_version = tool_version()
+
+    inputs = []
+    def add(role, f):
+      inputs.append([role, getattr(f, 'encoding', None), file_digest(f.name)])
+    for m in args.master:
+      add('master', m[0])
+    for c in (args.context or []):
+      add('context', c[0])
+    for (role, f) in [('translation', args.translation), ('po_file', args.po_file),
+        ('shortcut_groups', args.shortcut_groups)]:
+      if f is not None:
+        add(role, f)
+    if memory_digest is not None:
+      inputs.append(['memory', None, memory_digest])
+
+    description = {
+      'tool': self._tool_version,
+      'mode': args.mode,
+      'strip_shortcuts': bool(args.strip_shortcuts),
+      'memory_threshold': getattr(args, 'memory_threshold', None) if memory_digest is not None else None,
+      'approximate_shortcuts': getattr(args, 'approximate_shortcuts', None),
+      'approximate_time_budget': getattr(args, 'approximate_time_budget', None),
+      'compact_shortcuts': getattr(args, 'compact_shortcuts', None),
+      'out_encoding': args.out.encoding,
+      'inputs': inputs,
+    }
+    return hashlib.sha256(json.dumps(description, sort_keys=True).encode('utf-8')).hexdigest()
+
+  def memory_digest(self, args):
+    """Returns the digest of the --memory file, or None if there is none or it does not affect the output.
+    po2zusi only adds the translations of the PO file to the memory."""
+    if args.mode == 'po2zusi' or not getattr(args, 'memory', None) or not os.path.exists(args.memory):
+      return None
+    return file_digest(args.memory)
+
+  def _manifest_name(self, output):
+    return os.path.join(self.directory,
+        hashlib.sha256(os.path.abspath(output).encode('utf-8')).hexdigest()[:32] + '.json')
+
+  def is_fresh(self, output, digest):
+    try:
+      with open(self._manifest_name(output)) as f:
+        manifest = json.load(f)
+      return manifest['inputs'] == digest and manifest['output_digest'] == file_digest(output)
+    except (IOError, OSError, ValueError, KeyError):
+      return False
+
+  def store(self, output, digest):
+    if not os.path.isdir(self.directory):
+      os.makedirs(self.directory)
+    manifest = {
+      'output': os.path.abspath(output),
+      'inputs': digest,
+      'output_digest': file_digest(output),
+    }
+    manifest_name = self._manifest_name(output)
+    with open(manifest_name + '.tmp', 'w') as f:
+      json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(manifest_name + '.tmp', manifest_name)
+
+  def run(self, args, build):
+    """Calls build() unless the output files of the run are up to date."""
+    outputs = [args.out.name]
+    if args.mode == 'po2zusi':
+      # One output file per master file
+      outputs = [args.out.for_input(m[0].name).name for m in args.master]
+      if getattr(args, 'catalog', None):
+        outputs += [args.catalog.for_input(m[0].name).name for m in args.master]
+    memory_digest = self.memory_digest(args)
+    digest = self.input_digest(args, memory_digest)
+    if all(self.is_fresh(output, digest) for output in outputs):
+      for output in outputs:
+        logging.info("Build cache hit: {} is up to date".format(output))
+      self.hits.extend(outputs)
+      return
+    for output in outputs:
+      logging.info("Build cache miss: regenerating {}".format(output))
+    self.misses.extend(outputs)
+    build()
+    # zusi2po adds the translations to the memory, so the next run with the same inputs sees the memory as
+    # it is after this run.
+    new_memory_digest = self.memory_digest(args)
+    if new_memory_digest != memory_digest:
+      digest = self.input_digest(args, new_memory_digest)
+    for output in outputs:
+      self.store(output, digest)
+
+  def report(self):
+    logging.info("Build cache: {} hit(s), {} miss(es)".format(len(self.hits), len(self.misses)))
+    for output in self.hits:
+      logging.info("  hit:  {}".format(output))
+    for output in self.misses:
+      logging.info("  miss: {}".format(output))
@@ -0,0 +1,142 @@
+"""Binary translation catalogs for looking up translated texts by key without parsing a Zusi file.
+
+A catalog consists of a header, an open-addressing hash table, the table slots of the entries in the
+order of the Zusi file, and a pool of UTF-8 encoded strings. All numbers are little-endian 32-bit
+unsigned integers:
+
+  header: magic, version, entry count, table size (a power of two), offsets of the order list,
+          the table and the string pool
+  slot:   hash of the key (CRC-32 of its UTF-8 encoding), offset and length of the key,
+          offset and length of the value (offsets relative to the string pool);
+          the key offset is EMPTY for unused slots
+  order:  slot index of each entry in file order
+
+Collisions are resolved by linear probing. The table is at most half full, so lookups need one or two
+probes on average."""
+
+import logging
+import mmap
+import struct
+import zlib
+
+MAGIC = b'ZUSICAT\0'
+VERSION = 1
+HEADER = struct.Struct('<8sIIIIII')
+SLOT = struct.Struct('<IIIII')
+INDEX = struct.Struct('<I')
+EMPTY = 0xffffffff
+
+def write_catalog(f, pairs):
+  """Writes a catalog with the given (key, value) pairs to the binary file f. If a key occurs more than
+  once, the first value is kept. Returns the number of entries."""
+  pool = bytearray()
+  strings = {} # encoded string -> offset in the pool, so that repeated texts are stored once
+  def add_string(data):
+    try:
+      return strings[data]
+    except KeyError:
+      offset = strings[data] = len(pool)
+      pool.extend(data)
+      return offset
+
+  entries = []
+  seen = set()
+  for (key, value) in pairs:
+    if key in seen:
+      logging.info("Catalog: ignoring duplicate key {}".format(key))
+      continue
+    seen.add(key)
+    key_data = key.encode('UTF-8')
+    value_data = value.encode('UTF-8')
+    entries.append((zlib.crc32(key_data), add_string(key_data), len(key_data), add_string(value_data), len(value_data)))
+
+  table_size = 1
+  while table_size < 2 * len(entries):
+    table_size *= 2
+  mask = table_size - 1
+  table = [None] * table_size
+  order = []
+  for entry in entries:
+    index = entry[0] & mask
+    while table[index] is not None:
+      index = (index + 1) & mask
+    table[index] = entry
+    order.append(index)
+
+  order_offset = HEADER.size
+  table_offset = order_offset + INDEX.size * len(order)
+  pool_offset = table_offset + SLOT.size * table_size
+  f.write(HEADER.pack(MAGIC, VERSION, len(entries), table_size, order_offset, table_offset, pool_offset))
+  f.write(struct.pack('<%dI' % len(order), *order))
+  empty_slot = SLOT.pack(0, EMPTY, 0, 0, 0)
+  f.write(b''.join([SLOT.pack(*slot) if slot is not None else empty_slot for slot in table]))
+  f.write(pool)
+  return len(entries)
+
+class Catalog(object):
+  """Read-only view of a catalog file. The file is memory-mapped, so opening it does not parse anything
+  and lookups only touch the slots and strings they need."""
+
+  def __init__(self, filename):
+    with open(filename, 'rb') as f:
+      self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    (magic, version, self._count, self._table_size, self._order_offset, self._table_offset,
+        self._pool_offset) = HEADER.unpack_from(self._mmap, 0)
+    if magic != MAGIC or version != VERSION:
+      self._mmap.close()
+      raise ValueError("%s is not a translation catalog" % filename)
+    self._mask = self._table_size - 1
+
+  def close(self):
+    self._mmap.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  def __len__(self):
+    return self._count
+
+  def _string(self, offset, length):
+    start = self._pool_offset + offset
+    return self._mmap[start:start + length].decode('UTF-8')
+
+  def _find(self, key):
+    """Returns the slot of the given key, or None."""
+    key_data = key.encode('UTF-8')
+    key_hash = zlib.crc32(key_data)
+    index = key_hash & self._mask
+    while True:
+      slot = SLOT.unpack_from(self._mmap, self._table_offset + index * SLOT.size)
+      if slot[1] == EMPTY:
+        return None
+      if slot[0] == key_hash and slot[2] == len(key_data):
+        start = self._pool_offset + slot[1]
+        if self._mmap[start:start + slot[2]] == key_data:
+          return slot
+      index = (index + 1) & self._mask
+
+  def __getitem__(self, key):
+    slot = self._find(key)
+    if slot is None:
+      raise KeyError(key)
+    return self._string(slot[3], slot[4])
+
+  def __contains__(self, key):
+    return self._find(key) is not None
+
+  def get(self, key, default=None):
+    slot = self._find(key)
+    return default if slot is None else self._string(slot[3], slot[4])
+
+  def items(self):
+    """Yields (key, value) tuples in the order of the Zusi file."""
+    for i in range(self._count):
+      (index,) = INDEX.unpack_from(self._mmap, self._order_offset + i * INDEX.size)
+      slot = SLOT.unpack_from(self._mmap, self._table_offset + index * SLOT.size)
+      yield (self._string(slot[1], slot[2]), self._string(slot[3], slot[4]))
+
+  def __iter__(self):
+    return (key for (key, value) in self.items())
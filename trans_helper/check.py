@@ -0,0 +1,101 @@
+"""Checks translation files of several languages against a master translation file."""
+
+import concurrent.futures
+import os
+
+from . import myargparse
+from .translation_helper import iter_zusi
+
+class LanguageReport(object):
+  """Problems of one translation file compared to the master file."""
+
+  def __init__(self, name):
+    self.name = name
+    self.entries = 0
+    self.missing = [] # keys of the master file that are not translated, in master order
+    self.extra = [] # keys that do not occur in the master file
+    self.duplicates = [] # keys that occur more than once
+    self.collisions = [] # tuples (shortcut, keys) of keys of the same shortcut group with the same shortcut
+
+  def ok(self):
+    return not (self.missing or self.extra or self.duplicates or self.collisions)
+
+def master_key_index(master_file):
+  """Returns a dict key -> position of the first occurrence of the key in the master file."""
+  index = {}
+  for entry in master_file:
+    index.setdefault(entry.key, len(index))
+  return index
+
+def check_translation(name, f, master_keys, shortcuts):
+  """Streams the entries of the open translation file f and compares them with the master key index."""
+  report = LanguageReport(name)
+  seen = set()
+  duplicates = set()
+
+  def entries():
+    for entry in iter_zusi(f, {}):
+      report.entries += 1
+      if entry.key in seen:
+        if entry.key not in duplicates:
+          duplicates.add(entry.key)
+          report.duplicates.append(entry.key)
+      else:
+        seen.add(entry.key)
+        if entry.key not in master_keys:
+          report.extra.append(entry.key)
+      yield entry
+
+  report.collisions = [(shortcut, keys) for (_, shortcut, keys) in shortcuts.find_collisions(entries())]
+
+  # Only go through all master keys if some of them were not seen.
+  if len(seen) - len(report.extra) < len(master_keys):
+    report.missing = [key for key in master_keys if key not in seen]
+  return report
+
+# Master key index and shortcut groups of a worker process, set once by _init_worker()
+_worker_state = None
+
+def _init_worker(master_keys, shortcuts):
+  global _worker_state
+  _worker_state = (master_keys, shortcuts)
+
+def _check_file(name, encoding):
+  with myargparse.open_file(name, 'r', encoding) as f:
+    return check_translation(name, f, *_worker_state)
+
+def check_translations(master_file, translation_files, shortcuts, jobs=None):
+  """Checks the given open translation files against the master file. The master key index is built
+  once; if jobs > 1, the translation files are checked in that many worker processes.
+  Returns a list of LanguageReport in the order of translation_files."""
+  master_keys = master_key_index(master_file)
+  if jobs is None or jobs <= 1 or len(translation_files) <= 1 or \
+      not all(os.path.isfile(f.name) for f in translation_files):
+    return [check_translation(f.name, f, master_keys, shortcuts) for f in translation_files]
+
+  for f in translation_files:
+    f.close()
+  with concurrent.futures.ProcessPoolExecutor(max_workers=min(jobs, len(translation_files)),
+      initializer=_init_worker, initargs=(master_keys, shortcuts)) as executor:
+    futures = [executor.submit(_check_file, f.name, f.encoding) for f in translation_files]
+    return [future.result() for future in futures]
+
+def print_reports(reports, out):
+  """Prints a table with the number of problems per language, followed by the problems themselves."""
+  width = max([len("File")] + [len(report.name) for report in reports])
+  columns = ["Entries", "Missing", "Extra", "Duplicate", "Collisions"]
+  out.write(" ".join(["File".ljust(width)] + [c.rjust(10) for c in columns]) + "\n")
+  for report in reports:
+    values = [report.entries, len(report.missing), len(report.extra), len(report.duplicates), len(report.collisions)]
+    out.write(" ".join([report.name.ljust(width)] + [str(v).rjust(10) for v in values]) + "\n")
+
+  for report in reports:
+    if report.ok():
+      continue
+    out.write("\n" + report.name + ":\n")
+    for (title, keys) in [("Missing keys", report.missing), ("Keys not in the master file", report.extra),
+        ("Keys that occur multiple times", report.duplicates)]:
+      if keys:
+        out.write("  %s: %s\n" % (title, ", ".join(keys)))
+    for (shortcut, keys) in report.collisions:
+      out.write("  Shortcut '%s' used by: %s\n" % (shortcut, ", ".join(keys)))
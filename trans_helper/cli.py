@@ -0,0 +1,211 @@
+"""Command line interface of the translation helper.
+
+Only the modules needed by the selected mode are imported, after the command line has been validated."""
+
+import argparse
+from . import myargparse
+
+# Modes that do not generate a translation file (--out)
+check_modes = ['checkzusi', 'checkshortcuts', 'diff', 'import', 'query', 'batch']
+
+def build_parser():
+  parser = argparse.ArgumentParser(description='Translation helper for Zusi translation files.',
+      epilog='You can optionally specify an encoding argument after a file name, e.g. deutsch.txt@ISO-8859-1. ' +
+          'The encoding defaults to UTF-8.')
+  parser.add_argument('mode', choices=['zusi2pot', 'zusi2po', 'po2zusi', 'checkzusi', 'checkshortcuts', 'diff', 'import', 'query', 'batch'],
+      help="Mode to operate in. The following modes are supported: " +
+      " ### zusi2pot: Creates a .pot (PO template) file from the file specified by --master."
+      " ### zusi2po: Creates a .po file using keys and context information from the file specified by --master " +
+        "and translations from the file specified by --translation. This should only be necessary when " +
+        "converting an existing translation project to .po files."
+      " ### po2zusi: Creates a Zusi translation file (.txt) from the PO file specified by --po-file using " +
+        "keys and context information from the file specified by --master"
+      " ### checkzusi: Checks the files specified by --master (and --translations) for duplicate keys and other problems."
+      " ### checkshortcuts: Checks whether the keys of each group of --shortcut-groups have different shortcuts "
+        "in the Zusi translation file specified by --translation"
+      " ### diff: Lists the keys that were added, removed or changed between the two Zusi or PO files "
+        "specified by --translations (to --out or the standard output)"
+      " ### import: Imports the files specified by --master and --translations into the database specified by --database. "
+        "Files that did not change since the last import are skipped."
+      " ### query: Looks up entries of all languages in the database specified by --database "
+        "(--key, --source, --search)"
+      " ### batch: Runs the jobs in the file specified by --batch (one command line of this tool per line) "
+        "with --jobs worker processes, longest jobs first")
+  parser.add_argument('--master', '-m', action='append', nargs='+', type=myargparse.CodecFileType('r'),
+      help='Zusi master translation files (deutsch.txt, GleisplanEditor.txt, ...). '
+      + 'These are the files from which translation keys and their order will be taken.'
+      + 'For po2zusi with more than one file, --out must be a file name template.')
+  parser.add_argument('--translation', '-t', type=myargparse.CodecFileType('r'),
+      help='Existing Zusi translation file of the target language.')
+  parser.add_argument('--translations', '-T', nargs='+', type=myargparse.CodecFileType('r'),
+      help='checkzusi: Zusi translation files of any number of languages to check against the master files '
+      + 'for missing, extra and duplicate keys and (with --shortcut-groups) shortcut collisions. '
+      + 'diff: The old and the new Zusi or PO file (PO files are recognized by the extension .po or .pot). '
+      + 'import: Zusi or PO files of any number of languages. '
+      + 'The exit code is 1 if a problem or change was found')
+  parser.add_argument('--database', '-d', metavar='FILE',
+      help='import/query: SQLite translation database (created if it does not exist)')
+  parser.add_argument('--key', action='append',
+      help='query: Print the entries of all languages with this key')
+  parser.add_argument('--source', action='append',
+      help='query: Print the keys of the entries with this source text')
+  parser.add_argument('--search', action='append', metavar='QUERY',
+      help='query: Print the entries whose text or source text matches this SQLite full-text query')
+  parser.add_argument('--batch', type=myargparse.CodecFileType('r'), metavar='FILE',
+      help='batch: File with one command line (without the program name) per line')
+  parser.add_argument('--timings', metavar='FILE',
+      help='batch: File in which the run times of the jobs are recorded to estimate them in later runs '
+      + '(default: the batch file name with .timings.json appended)')
+  parser.add_argument('--diff-format', choices=['text', 'json'], default='text',
+      help='diff: Output format, one line per change (default: text)')
+  parser.add_argument('--po-file', '-p', type=myargparse.CodecFileType('r'),
+      help='Existing PO translation file of the target language.')
+  parser.add_argument('--context', '-c', action='append', nargs='*', type=myargparse.CodecFileType('r'),
+      help='List of context entries (disambiguation of identical source texts).')
+  parser.add_argument('--shortcut-groups', '-s', type=myargparse.CodecFileType('r'),
+      help='List of shortcut groups (translation keys that should not get the same keyboard shortcut). '
+      + 'Each key should be on its own line, and the groups should be separated by an empty line. '
+      + 'The file must also end with an empty line. '
+      + 'If this option is supplied, shortcuts are generated for translations whose source strings '
+      + 'contain a keyboard shortcut')
+  parser.add_argument('--approximate-shortcuts', '-a', type=int, metavar='N',
+      help='po2zusi: Use a fast approximate solver instead of the exact one for shortcut groups '
+      + '(or independent parts of them) with at least N entries')
+  parser.add_argument('--approximate-time-budget', type=float, default=1.0, metavar='SECONDS',
+      help='po2zusi: Maximum time spent improving each approximate shortcut assignment (default: 1)')
+  parser.add_argument('--compact-shortcuts', type=int, metavar='N',
+      help='po2zusi: Keep the cost matrices of shortcut groups with at least N entries in compact arrays '
+      + 'to bound memory use (slower; the memory use of each such group is logged)')
+  parser.add_argument('--index-cache', metavar='DIR',
+      help='po2zusi: Store the contexts, shortcut groups and master entries that need a shortcut in this '
+      + 'directory, so that later runs with unchanged master, context and shortcut group files do not parse them again')
+  parser.add_argument('--out', '-o', type=myargparse.CodecFileType('w', deferred=True),
+      help='Output file. For po2zusi, this may be a template that is filled in for each master file: '
+      + '{name} is the file name of the master file, {stem} its part before the first "." (e.g. out/{name})')
+  parser.add_argument('--catalog', type=myargparse.CodecFileType('wb', deferred=True), metavar='FILE',
+      help='po2zusi: Also write the output as a binary catalog for fast lookups by key (see trans_helper.catalog). '
+      + 'May be a template like --out')
+  parser.add_argument('--strip-shortcuts', '-ss', action='store_const', const=True,
+      help='zusi2pot/zusi2po: Strip keyboard shortcuts from the Zusi file. Only affects source texts whose key contains "Caption" or "Text"')
+  parser.add_argument('--memory', metavar='FILE',
+      help='zusi2pot/zusi2po/po2zusi: Translation memory file (created if it does not exist). zusi2po and po2zusi '
+      + 'add their translations to it; zusi2pot and zusi2po emit fuzzy suggestions from it for untranslated texts')
+  parser.add_argument('--memory-threshold', type=float, default=0.7, metavar='SIMILARITY',
+      help='Minimum similarity (0..1) of a translation memory suggestion (default: 0.7)')
+  parser.add_argument('--jobs', '-j', type=int, metavar='N',
+      help='zusi2pot/zusi2po/checkzusi: Parse large Zusi files in chunks with N worker processes, '
+      + 'and check the --translations files in parallel. batch: Number of jobs run in parallel')
+  parser.add_argument('--watch', '-w', action='store_const', const=True,
+      help='zusi2pot/zusi2po/po2zusi: Keep running and regenerate the output file whenever one of the input files changes')
+  parser.add_argument('--build-cache', '-b', metavar='DIR',
+      help='zusi2pot/zusi2po/po2zusi: Skip the run if the inputs, flags and tool version are the same as '
+      + 'when the output file was last generated into this cache directory, and the output file is unchanged')
+
+  return parser
+
+def parse_args(argv=None):
+  parser = build_parser()
+  args = parser.parse_args(argv)
+  # "-m a.txt b.txt" is the same as "-m a.txt -m b.txt"
+  if args.master:
+    args.master = [[f] for files in args.master for f in files]
+
+  if args.mode in ['checkshortcuts', 'diff', 'query', 'batch']:
+    if args.master:
+      parser.error('--master cannot be used with %s mode' % args.mode)
+  elif not args.master and args.mode != 'import':
+    parser.error('Missing master file (--master/-m)')
+  if args.mode == 'checkshortcuts' and (args.translation is None or args.shortcut_groups is None):
+    parser.error('checkshortcuts mode needs --translation/-t and --shortcut-groups/-s')
+  if args.mode == 'diff' and len(args.translations or []) != 2:
+    parser.error('diff mode needs two files (--translations/-T OLD NEW)')
+  if args.mode in ['import', 'query'] and args.database is None:
+    parser.error('%s mode needs a database (--database/-d)' % args.mode)
+  if args.mode == 'import' and not (args.master or args.translations):
+    parser.error('Nothing to import (--master/-m, --translations/-T)')
+  if args.mode == 'query' and not (args.key or args.source or args.search):
+    parser.error('Nothing to query (--key, --source, --search)')
+  if args.mode == 'batch' and args.batch is None:
+    parser.error('batch mode needs a batch file (--batch)')
+  if (args.batch or args.timings) and args.mode != 'batch':
+    parser.error('--batch/--timings can only be used with batch mode')
+  if args.mode == 'zusi2po' and args.translation is None:
+    parser.error('Missing existing translation file (--translation/-t)')
+  if args.mode == 'po2zusi' and args.po_file is None:
+    parser.error('Missing existing translation file (--po-file/-p)')
+  if args.mode not in check_modes and args.out is None:
+    parser.error('Missing output file name (--out/-o)')
+  if args.strip_shortcuts and args.mode not in ['zusi2pot', 'zusi2po']:
+    parser.error('--strip-shortcuts can only be used with zusi2pot/zusi2po mode')
+  if args.approximate_shortcuts is not None and args.mode != 'po2zusi':
+    parser.error('--approximate-shortcuts can only be used with po2zusi mode')
+  if args.index_cache and args.mode != 'po2zusi':
+    parser.error('--index-cache can only be used with po2zusi mode')
+  if args.compact_shortcuts is not None and args.mode != 'po2zusi':
+    parser.error('--compact-shortcuts can only be used with po2zusi mode')
+  if args.mode == 'po2zusi' and args.out is not None and len(args.master) > 1:
+    if args.watch:
+      parser.error('--watch can only be used with one master file in po2zusi mode')
+    if not args.out.is_template:
+      parser.error('Need an output file name template (e.g. -o out/{name}) for more than one master file in po2zusi mode')
+    try:
+      names = [args.out.for_input(m[0].name).name for m in args.master]
+    except (KeyError, IndexError, ValueError):
+      parser.error('Invalid output file name template, only {name} and {stem} can be used')
+    if len(set(names)) < len(names):
+      parser.error('The output file name template gives the same file name for more than one master file')
+  if args.catalog is not None:
+    if args.mode != 'po2zusi':
+      parser.error('--catalog can only be used with po2zusi mode')
+    if args.watch:
+      parser.error('--catalog cannot be used with --watch')
+    if len(args.master) > 1 and not args.catalog.is_template:
+      parser.error('Need a catalog file name template (e.g. --catalog out/{stem}.cat) for more than one master file')
+    try:
+      [args.catalog.for_input(m[0].name) for m in args.master]
+    except (KeyError, IndexError, ValueError):
+      parser.error('Invalid catalog file name template, only {name} and {stem} can be used')
+  if args.translations and args.mode not in ['checkzusi', 'diff', 'import']:
+    parser.error('--translations can only be used with checkzusi/diff/import mode')
+  if args.jobs is not None and args.jobs < 1:
+    parser.error('--jobs must be at least 1')
+  if args.memory and args.mode in check_modes:
+    parser.error('--memory cannot be used with %s mode' % args.mode)
+  if args.watch and args.mode in check_modes:
+    parser.error('--watch cannot be used with %s mode' % args.mode)
+  if args.build_cache and args.mode in check_modes:
+    parser.error('--build-cache cannot be used with %s mode' % args.mode)
+  if args.build_cache and args.watch:
+    parser.error('--build-cache cannot be used with --watch')
+  if args.memory and args.watch:
+    parser.error('--memory cannot be used with --watch')
+
+  return args
+
+def main(argv=None):
+  args = parse_args(argv)
+
+  import logging
+  logging.basicConfig(level=logging.INFO)
+
+  run(args)
+
+def run(args):
+  """Runs the mode selected by the (validated) command line arguments."""
+  if args.mode == 'batch':
+    import sys
+    from . import scheduler
+    jobs = scheduler.read_batch_file(args.batch)
+    sys.exit(scheduler.run_batch(jobs, args.jobs, args.timings or args.batch.name + '.timings.json'))
+  elif args.watch:
+    from . import watch
+    watch.Watcher(args).run()
+  elif args.build_cache:
+    from . import build_cache
+    from . import translation_helper
+    cache = build_cache.BuildCache(args.build_cache)
+    cache.run(args, lambda: translation_helper.TranslationHelper().main(args))
+    cache.report()
+  else:
+    from . import translation_helper
+    translation_helper.TranslationHelper().main(args)
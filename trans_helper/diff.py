@@ -0,0 +1,82 @@
+"""Lists the differences between two versions of a Zusi or PO translation file."""
+
+import json
+
+from . import myargparse
+from .translation_helper import TranslationFile, iter_zusi
+
+def sorted_entries(f):
+  """Reads the open Zusi or PO file f and returns a list of tuples (key, fields) sorted by key, where
+  fields is a tuple of the compared fields of an entry. Entries with the same key keep their order."""
+  if myargparse.is_po_file(f.name):
+    entries = [(e.key, (e.value, getattr(e, 'src_value', ''), e.context)) for e in TranslationFile().read_from_po(f)]
+  else:
+    entries = [(e.key, (e.value,)) for e in iter_zusi(f, {})]
+  entries.sort(key=lambda entry: entry[0])
+  return entries
+
+def _grouped(entries):
+  """Yields tuples (key, list of fields) for a list returned by sorted_entries()."""
+  i = 0
+  while i < len(entries):
+    key = entries[i][0]
+    j = i + 1
+    while j < len(entries) and entries[j][0] == key:
+      j += 1
+    yield (key, [fields for (_, fields) in entries[i:j]])
+    i = j
+
+def diff_entries(old_entries, new_entries):
+  """Yields tuples (change, key, old fields, new fields) in key order by merging two lists returned by
+  sorted_entries(). change is 'added', 'removed' or 'changed'; the fields are lists with one element per
+  occurrence of the key."""
+  old = _grouped(old_entries)
+  new = _grouped(new_entries)
+  (old_key, old_fields) = next(old, (None, None))
+  (new_key, new_fields) = next(new, (None, None))
+  while old_key is not None or new_key is not None:
+    if new_key is None or (old_key is not None and old_key < new_key):
+      yield ('removed', old_key, old_fields, [])
+      (old_key, old_fields) = next(old, (None, None))
+    elif old_key is None or new_key < old_key:
+      yield ('added', new_key, [], new_fields)
+      (new_key, new_fields) = next(new, (None, None))
+    else:
+      if old_fields != new_fields:
+        yield ('changed', old_key, old_fields, new_fields)
+      (old_key, old_fields) = next(old, (None, None))
+      (new_key, new_fields) = next(new, (None, None))
+
+FIELD_NAMES = ['value', 'source', 'context']
+
+def _describe(fields):
+  return " | ".join(["'" + field[0] + "'" for field in fields])
+
+def write_text(changes, out):
+  """Writes one line per change ('+' added, '-' removed, '~' changed). Returns the number of changes."""
+  count = 0
+  for (change, key, old_fields, new_fields) in changes:
+    if change == 'added':
+      out.write("+ %s = %s\n" % (key, _describe(new_fields)))
+    elif change == 'removed':
+      out.write("- %s = %s\n" % (key, _describe(old_fields)))
+    elif len(old_fields) == len(new_fields) == 1:
+      for (name, old_value, new_value) in zip(FIELD_NAMES, old_fields[0], new_fields[0]):
+        if old_value != new_value:
+          out.write("~ %s: %s '%s' -> '%s'\n" % (key, name, old_value, new_value))
+    else:
+      out.write("~ %s: %s -> %s\n" % (key, _describe(old_fields), _describe(new_fields)))
+    count += 1
+  return count
+
+def write_json(changes, out):
+  """Writes one JSON object per line and change. Returns the number of changes."""
+  count = 0
+  for (change, key, old_fields, new_fields) in changes:
+    change = {'change': change, 'key': key}
+    for (name, fields) in [('old', old_fields), ('new', new_fields)]:
+      if fields:
+        change[name] = [dict(zip(FIELD_NAMES, field)) for field in fields]
+    out.write(json.dumps(change, ensure_ascii=False) + "\n")
+    count += 1
+  return count
@@ -0,0 +1,119 @@
+"""Precomputed join of the master files with their contexts and shortcut groups for po2zusi.
+
+Shortcut generation only needs, for each master file and shortcut group, the master entries that
+need a shortcut (captions and texts whose source text contains one) and their source shortcuts. This
+does not depend on the target language, so it is computed once per run, and can be stored in a cache
+directory under a digest of the master, context and shortcut group files, so that later runs with
+unchanged files neither parse the context and shortcut group files nor scan the master files for
+group entries."""
+
+import hashlib
+import json
+import logging
+import os
+
+from .build_cache import file_digest, tool_version
+from .translation_helper import TranslationEntry, TranslationFile, iter_zusi, read_contexts
+
+# Version of the cache file format
+VERSION = 2
+
+class MasterIndex(object):
+  def __init__(self, contexts, groups, candidates):
+    self.contexts = contexts # key -> context
+    self.groups = groups # list of sets of keys, as in ShortcutGroupFile
+    # For each master file, a list of ShortcutGroupFile.get_candidates() for each group. Each master file
+    # becomes its own output file, so its shortcuts are assigned independently of the other master files.
+    self.candidates = candidates
+
+  @classmethod
+  def build(cls, masters, context_files, shortcut_groups, shortcuts):
+    """Reads the context files (the --context argument) and the shortcut group file (may be None) into
+    the given empty ShortcutGroupFile and scans the open master files for entries of shortcut groups.
+    The master files are rewound afterwards."""
+    contexts = read_contexts(context_files)
+    if shortcut_groups is not None:
+      logging.info("Reading shortcut group file {}".format(shortcut_groups.name))
+      shortcuts.read_from_file(shortcut_groups)
+
+    candidates = []
+    for master in masters:
+      group_master_file = TranslationFile()
+      if len(shortcuts.key_to_group):
+        logging.info("Reading shortcut group entries from master translation file {}".format(master.name))
+        for entry in iter_zusi(master, contexts):
+          if entry.key in shortcuts.key_to_group:
+            group_master_file.append(entry)
+        master.seek(0)
+      candidates.append([shortcuts.get_candidates(group, group_master_file) for group in shortcuts.groups])
+    return cls(contexts, shortcuts.groups, candidates)
+
+  def apply_to(self, shortcuts):
+    """Loads the shortcut groups into the given empty ShortcutGroupFile."""
+    for group in self.groups:
+      shortcuts.groups.append(group)
+      for key in group:
+        shortcuts.key_to_group[key] = group
+
+  def to_json(self):
+    return {
+      'version': VERSION,
+      'contexts': self.contexts,
+      'groups': [sorted(group) for group in self.groups],
+      'candidates': [[[[entry.key, entry.value, entry.context, source_shortcut]
+          for (entry, source_shortcut) in group_candidates] for group_candidates in master_candidates]
+          for master_candidates in self.candidates],
+    }
+
+  @classmethod
+  def from_json(cls, data):
+    if data['version'] != VERSION:
+      raise ValueError("Unsupported master index version %r" % data['version'])
+    candidates = [[[(TranslationEntry(key, value, value, context), source_shortcut)
+        for (key, value, context, source_shortcut) in group_candidates] for group_candidates in master_candidates]
+        for master_candidates in data['candidates']]
+    return cls(data['contexts'], [set(group) for group in data['groups']], candidates)
+
+def index_digest(masters, context_files, shortcut_groups):
+  """Returns a digest of the tool version and the contents and encodings of the given files, or None if
+  one of them is not a regular file."""
+  files = [('master', f) for f in masters] + [('context', f) for f in context_files]
+  if shortcut_groups is not None:
+    files.append(('shortcut_groups', shortcut_groups))
+  if not all(os.path.isfile(f.name) for (role, f) in files):
+    return None
+  description = {
+    'tool': tool_version(),
+    'inputs': [[role, getattr(f, 'encoding', None), file_digest(f.name)] for (role, f) in files],
+  }
+  return hashlib.sha256(json.dumps(description, sort_keys=True).encode('utf-8')).hexdigest()
+
+def get_index(args, shortcuts):
+  """Returns the MasterIndex for the parsed command line arguments of a po2zusi run and loads its shortcut
+  groups into the given empty ShortcutGroupFile. If args.index_cache is set, the index is loaded from or
+  stored to that directory."""
+  masters = [m[0] for m in args.master]
+  context_files = [c[0] for c in (args.context or [])]
+  directory = getattr(args, 'index_cache', None)
+  digest = index_digest(masters, context_files, args.shortcut_groups) if directory else None
+  if digest is None:
+    return MasterIndex.build(masters, args.context, args.shortcut_groups, shortcuts)
+
+  filename = os.path.join(directory, 'index-' + digest[:32] + '.json')
+  try:
+    with open(filename, encoding='utf-8') as f:
+      index = MasterIndex.from_json(json.load(f))
+    logging.info("Master index cache hit: {}".format(filename))
+    index.apply_to(shortcuts)
+    return index
+  except (IOError, OSError, ValueError, KeyError, TypeError):
+    pass
+
+  logging.info("Master index cache miss: building {}".format(filename))
+  index = MasterIndex.build(masters, args.context, args.shortcut_groups, shortcuts)
+  if not os.path.isdir(directory):
+    os.makedirs(directory)
+  with open(filename + '.tmp', 'w', encoding='utf-8') as f:
+    json.dump(index.to_json(), f, ensure_ascii=False)
+  os.replace(filename + '.tmp', filename)
+  return index
@@ -144,6 +144,36 @@ Notes:
 - The cost matrix must be rectangular or square. An irregular matrix will
   *not* work.
 
+Reusing a Munkres Object
+========================
+
+A Munkres object keeps its work buffers between calls to ``compute()``
+and only grows them when a larger matrix than before is seen. When solving
+many small problems, create one Munkres object and reuse it.
+
+The cost matrix can also be passed as a flat sequence in row-major order
+(for instance an ``array.array``) with ``compute_flat()``::
+
+    m = Munkres()
+    indexes = m.compute_flat([5, 9, 1, 10, 3, 2, 8, 7, 4], 3, 3)
+
+Compact Work Buffers
+====================
+
+The work matrix is padded to a square, so a problem with many more rows than
+columns needs a lot of memory. ``Munkres(compact=True)`` does not pad the
+matrix: it works on a *rows* x *columns* matrix (transposed if it has more
+rows than columns), which needs no dummy rows or columns because only as
+many columns as there are rows have to be covered (Bourgeois and Lassalle's
+extension of the algorithm to rectangular matrices). The work matrix is an
+``array.array`` of unsigned 16-bit integers, which is widened to 64-bit
+integers when the values could exceed 65535, and the positions of its zeros
+are kept in an array of 32-bit integers. Both are reused between calls.
+This is slower than working on lists, but needs only a fraction of the
+memory. The total cost of the result is the same, but ties between
+assignments of equal cost may be broken differently.
+``memory_usage()`` returns the size of the work buffers in bytes.
+
 Calculating Profit, Rather than Cost
 ====================================
 
@@ -277,7 +307,7 @@ __docformat__ = 'restructuredtext'
 # ---------------------------------------------------------------------------
 
 import sys
-import copy
+from array import array
 
 # ---------------------------------------------------------------------------
 # Exports
@@ -304,18 +334,35 @@ class Munkres:
     """
     Calculate the Munkres solution to the classical assignment problem.
     See the module documentation for usage.
+
+    The work buffers (cost matrix, covers, stars and primes) are kept
+    between calls to ``compute()`` and only grow when a larger matrix is
+    seen, so one instance can solve many small problems without
+    reallocating them.
     """
 
-    def __init__(self):
-        """Create a new instance"""
-        self.C = None
+    def __init__(self, compact=False):
+        """
+        Create a new instance. If *compact* is true, the work buffers are
+        kept in compact arrays (see the module documentation).
+        """
+        self.compact = compact
+        self.bound = 0
+        self.peak_memory = 0
+        self.C = array('H') if compact else []
         self.row_covered = []
         self.col_covered = []
         self.n = 0
+        self.height = 0
+        self.width = 0
         self.Z0_r = 0
         self.Z0_c = 0
-        self.marked = None
-        self.path = None
+        self.star_in_row = []
+        self.star_in_col = []
+        self.prime_in_row = []
+        self.path_rows = []
+        self.path_cols = []
+        self.zeros = array('I') if compact else []
 
     def make_cost_matrix(profit_matrix, inversion_function):
         """
@@ -373,9 +420,9 @@ class Munkres:
         :Parameters:
             cost_matrix : list of lists
                 The cost matrix. If this cost matrix is not square, it
-                will be padded with zeros, via a call to ``pad_matrix()``.
-                (This method does *not* modify the caller's matrix. It
-                operates on a copy of the matrix.)
+                will be padded with zeros. (This method does *not* modify
+                the caller's matrix. It copies the matrix into the work
+                buffer of this instance.)
 
                 **WARNING**: This code handles square and rectangular
                 matrices. It does *not* handle irregular matrices.
@@ -385,16 +432,155 @@ class Munkres:
                  cost path through the matrix
 
         """
-        self.C = self.pad_matrix(cost_matrix)
-        self.n = len(self.C)
-        self.original_length = len(cost_matrix)
-        self.original_width = len(cost_matrix[0])
-        self.row_covered = [False for i in range(self.n)]
-        self.col_covered = [False for i in range(self.n)]
+        rows = len(cost_matrix)
+        columns = len(cost_matrix[0]) if rows else 0
+        if self.compact:
+            if rows > columns:
+                line = lambda j: [row[j] for row in cost_matrix]
+            else:
+                line = lambda i: cost_matrix[i]
+            return self.__compute_compact(line, rows, columns)
+        n = max(rows, columns)
+        self.__reserve(n, n)
+        C = self.C
+        for i in range(rows):
+            row = cost_matrix[i]
+            base = i * n
+            C[base:base + columns] = row
+            if columns < n:
+                C[base + columns:base + n] = [0] * (n - columns)
+        self.__pad_rows(rows)
+        return self.__solve(rows, columns)
+
+    def compute_flat(self, costs, rows, columns):
+        """
+        Like ``compute()``, but takes the cost matrix as a flat sequence
+        in row-major order (e.g. a list or an ``array.array``), i.e. the
+        cost of row ``i`` and column ``j`` is ``costs[i * columns + j]``.
+
+        :Parameters:
+            costs : sequence of numbers
+                The cost matrix in row-major order. It is not modified.
+
+            rows : int
+                Number of rows of the cost matrix
+
+            columns : int
+                Number of columns of the cost matrix
+
+        :rtype: list
+        :return: A list of ``(row, column)`` tuples that describe the lowest
+                 cost path through the matrix
+        """
+        if self.compact:
+            if rows > columns:
+                line = lambda j: costs[j:rows * columns:columns]
+            else:
+                line = lambda i: costs[i * columns:(i + 1) * columns]
+            return self.__compute_compact(line, rows, columns)
+        n = max(rows, columns)
+        self.__reserve(n, n)
+        C = self.C
+        if columns == n:
+            C[0:rows * n] = costs[0:rows * n]
+        else:
+            padding = [0] * (n - columns)
+            for i in range(rows):
+                base = i * n
+                C[base:base + columns] = costs[i * columns:(i + 1) * columns]
+                C[base + columns:base + n] = padding
+        self.__pad_rows(rows)
+        return self.__solve(rows, columns)
+
+    def __compute_compact(self, line, rows, columns):
+        """
+        Solve a *rows* x *columns* problem without padding. *line(i)*
+        returns row *i* of the work matrix, which is the transposed cost
+        matrix if it has more rows than columns.
+        """
+        transposed = rows > columns
+        (height, width) = (columns, rows) if transposed else (rows, columns)
+        self.__reserve(height, width)
+        for i in range(height):
+            self.__copy_row(i * width, line(i))
+        return self.__solve(rows, columns, transposed)
+
+    def __reserve(self, height, width):
+        """
+        Make the work buffers large enough for a *height* x *width* work
+        matrix and reset them.
+        """
+        n = max(height, width)
+        grow = n - len(self.row_covered)
+        if grow > 0:
+            self.row_covered.extend([False] * grow)
+            self.col_covered.extend([False] * grow)
+            self.star_in_row.extend([-1] * grow)
+            self.star_in_col.extend([-1] * grow)
+            self.prime_in_row.extend([-1] * grow)
+            self.path_rows.extend([0] * (2 * grow))
+            self.path_cols.extend([0] * (2 * grow))
+        size = height * width
+        if self.compact:
+            if self.C.typecode != 'H':
+                # Widened for an earlier matrix
+                self.C = array('H')
+            if len(self.C) < size:
+                self.C.frombytes(bytes(self.C.itemsize * (size - len(self.C))))
+            self.bound = 0
+        elif len(self.C) < size:
+            self.C.extend([0] * (size - len(self.C)))
+        self.n = n
+        self.height = height
+        self.width = width
+        self.__clear_covers()
+        self.star_in_row[0:n] = self.prime_in_row[0:n] = [-1] * n
+        self.star_in_col[0:n] = self.star_in_row[0:n]
         self.Z0_r = 0
         self.Z0_c = 0
-        self.path = self.__make_matrix(self.n * 2, 0)
-        self.marked = self.__make_matrix(self.n, 0)
+
+    def __copy_row(self, base, row):
+        """Copy a row of the cost matrix into the compact work matrix."""
+        C = self.C
+        if not (isinstance(row, array) and row.typecode == C.typecode):
+            try:
+                row = array(C.typecode, row)
+            except OverflowError:
+                self.__widen()
+                return self.__copy_row(base, row)
+        C[base:base + len(row)] = row
+        if len(row):
+            self.bound = max(self.bound, max(row))
+
+    def __widen(self):
+        """Switch the compact work matrix to 64-bit integers."""
+        if self.C.typecode != 'q':
+            self.C = array('q', self.C)
+
+    def memory_usage(self):
+        """
+        Return the size of the work buffers in bytes (for lists, not
+        counting the int objects they refer to). The largest size seen
+        while solving is kept in ``peak_memory``.
+        """
+        return sum(sys.getsizeof(buffer) for buffer in [self.C, self.zeros,
+            self.row_covered, self.col_covered, self.star_in_row,
+            self.star_in_col, self.prime_in_row, self.path_rows,
+            self.path_cols])
+
+    def __pad_rows(self, rows):
+        """Fill the rows after the given row of the work matrix with zeros."""
+        n = self.n
+        if rows < n:
+            self.C[rows * n:n * n] = [0] * ((n - rows) * n)
+
+    def __solve(self, rows, columns, transposed=False):
+        """
+        Run the algorithm on the work matrix. If *transposed* is true, its
+        rows are the columns of the cost matrix.
+        """
+        self.original_length = rows
+        self.original_width = columns
 
         done = False
         step = 1
@@ -412,41 +598,37 @@ class Munkres:
                 step = func()
             except KeyError:
                 done = True
+        self.peak_memory = max(self.peak_memory, self.memory_usage())
 
         # Look for the starred columns
+        if transposed:
+            return sorted((self.star_in_row[j], j) for j in range(self.height)
+                          if self.star_in_row[j] >= 0)
         results = []
-        for i in range(self.original_length):
-            for j in range(self.original_width):
-                if self.marked[i][j] == 1:
-                    results += [(i, j)]
+        for i in range(rows):
+            j = self.star_in_row[i]
+            if 0 <= j < columns:
+                results += [(i, j)]
 
         return results
 
-    def __copy_matrix(self, matrix):
-        """Return an exact copy of the supplied matrix"""
-        return copy.deepcopy(matrix)
-
-    def __make_matrix(self, n, val):
-        """Create an *n*x*n* matrix, populating it with the specific value."""
-        matrix = []
-        for i in range(n):
-            matrix += [[val for j in range(n)]]
-        return matrix
-
     def __step1(self):
         """
         For each row of the matrix, find the smallest element and
         subtract it from every element in its row. Go to Step 2.
         """
         C = self.C
-        n = self.n
-        for i in range(n):
-            minval = min(self.C[i])
+        width = self.width
+        for i in range(self.height):
+            base = i * width
+            minval = min(C[base:base + width])
             # Find the minimum value for this row and subtract that minimum
             # from every element in the row.
-            for j in range(n):
-                self.C[i][j] -= minval
+            if minval:
+                for j in range(base, base + width):
+                    C[j] -= minval
 
+        self.__find_zeros()
         return 2
 
     def __step2(self):
@@ -455,15 +637,17 @@ class Munkres:
         zero in its row or column, star Z. Repeat for each element in the
         matrix. Go to Step 3.
         """
-        n = self.n
-        for i in range(n):
-            for j in range(n):
-                if (self.C[i][j] == 0) and \
-                        (not self.col_covered[j]) and \
-                        (not self.row_covered[i]):
-                    self.marked[i][j] = 1
-                    self.col_covered[j] = True
-                    self.row_covered[i] = True
+        width = self.width
+        row_covered = self.row_covered
+        col_covered = self.col_covered
+        for pos in self.zeros:
+            i = pos // width
+            j = pos - i * width
+            if (not col_covered[j]) and (not row_covered[i]):
+                self.star_in_row[i] = j
+                self.star_in_col[j] = i
+                col_covered[j] = True
+                row_covered[i] = True
 
         self.__clear_covers()
         return 3
@@ -473,16 +657,16 @@ class Munkres:
         Cover each column containing a starred zero. If K columns are
         covered, the starred zeros describe a complete set of unique
         assignments. In this case, Go to DONE, otherwise, Go to Step 4.
+        (K is the number of rows of the work matrix, which has at most as
+        many rows as columns.)
         """
-        n = self.n
         count = 0
-        for i in range(n):
-            for j in range(n):
-                if self.marked[i][j] == 1:
-                    self.col_covered[j] = True
-                    count += 1
+        for j in range(self.width):
+            if self.star_in_col[j] >= 0:
+                self.col_covered[j] = True
+                count += 1
 
-        if count >= n:
+        if count >= self.height:
             step = 7 # done
         else:
             step = 4
@@ -508,8 +692,8 @@ class Munkres:
                 done = True
                 step = 6
             else:
-                self.marked[row][col] = 2
-                star_col = self.__find_star_in_row(row)
+                self.prime_in_row[row] = col
+                star_col = self.star_in_row[row]
                 if star_col >= 0:
                     col = star_col
                     self.row_covered[row] = True
@@ -534,26 +718,27 @@ class Munkres:
         primes and uncover every line in the matrix. Return to Step 3
         """
         count = 0
-        path = self.path
-        path[count][0] = self.Z0_r
-        path[count][1] = self.Z0_c
+        path_rows = self.path_rows
+        path_cols = self.path_cols
+        path_rows[count] = self.Z0_r
+        path_cols[count] = self.Z0_c
         done = False
         while not done:
-            row = self.__find_star_in_col(path[count][1])
+            row = self.star_in_col[path_cols[count]]
             if row >= 0:
                 count += 1
-                path[count][0] = row
-                path[count][1] = path[count-1][1]
+                path_rows[count] = row
+                path_cols[count] = path_cols[count-1]
             else:
                 done = True
 
             if not done:
-                col = self.__find_prime_in_row(path[count][0])
+                col = self.prime_in_row[path_rows[count]]
                 count += 1
-                path[count][0] = path[count-1][0]
-                path[count][1] = col
+                path_rows[count] = path_rows[count-1]
+                path_cols[count] = col
 
-        self.__convert_path(path, count)
+        self.__convert_path(count)
         self.__clear_covers()
         self.__erase_primes()
         return 3
@@ -566,108 +751,101 @@ class Munkres:
         lines.
         """
         minval = self.__find_smallest()
-        for i in range(self.n):
-            for j in range(self.n):
-                if self.row_covered[i]:
-                    self.C[i][j] += minval
-                if not self.col_covered[j]:
-                    self.C[i][j] -= minval
+        if self.compact:
+            # Elements in a covered row and column grow by minval.
+            self.bound += minval
+            if self.bound > 0xffff:
+                self.__widen()
+        C = self.C
+        width = self.width
+        row_covered = self.row_covered
+        col_covered = self.col_covered
+        zeros = self.zeros
+        del zeros[:]
+        # Elements in a covered row and an uncovered column (and vice
+        # versa) do not change. The list of zeros is rebuilt in the same
+        # pass, so that Step 4 does not have to scan the matrix.
+        for i in range(self.height):
+            base = i * width
+            if row_covered[i]:
+                for j in range(width):
+                    if col_covered[j]:
+                        C[base + j] += minval
+                    elif C[base + j] == 0:
+                        zeros.append(base + j)
+            else:
+                for j in range(width):
+                    if not col_covered[j]:
+                        C[base + j] -= minval
+                    if C[base + j] == 0:
+                        zeros.append(base + j)
         return 4
 
     def __find_smallest(self):
         """Find the smallest uncovered value in the matrix."""
         minval = sys.maxsize
-        for i in range(self.n):
-            for j in range(self.n):
-                if (not self.row_covered[i]) and (not self.col_covered[j]):
-                    if minval > self.C[i][j]:
-                        minval = self.C[i][j]
+        C = self.C
+        width = self.width
+        uncovered_cols = [j for j in range(width) if not self.col_covered[j]]
+        for i in range(self.height):
+            if not self.row_covered[i]:
+                base = i * width
+                for j in uncovered_cols:
+                    if minval > C[base + j]:
+                        minval = C[base + j]
         return minval
 
-    def __find_a_zero(self):
-        """Find the first uncovered element with value 0"""
-        row = -1
-        col = -1
-        i = 0
-        n = self.n
-        done = False
-
-        while not done:
-            j = 0
-            while True:
-                if (self.C[i][j] == 0) and \
-                        (not self.row_covered[i]) and \
-                        (not self.col_covered[j]):
-                    row = i
-                    col = j
-                    done = True
-                j += 1
-                if j >= n:
-                    break
-            i += 1
-            if i >= n:
-                done = True
-
-        return (row, col)
+    def __find_zeros(self):
+        """Collect the positions of all zeros of the matrix in row-major order."""
+        C = self.C
+        zeros = (pos for pos in range(self.height * self.width) if C[pos] == 0)
+        if self.compact:
+            del self.zeros[:]
+            self.zeros.extend(zeros)
+        else:
+            self.zeros = list(zeros)
 
-    def __find_star_in_row(self, row):
+    def __find_a_zero(self):
         """
-        Find the first starred element in the specified row. Returns
-        the column index, or -1 if no starred element was found.
+        Find an uncovered element with value 0. Like the original
+        implementation, this returns the last uncovered zero in the first
+        row that contains one.
         """
+        width = self.width
+        row_covered = self.row_covered
+        col_covered = self.col_covered
+        row = -1
         col = -1
-        for j in range(self.n):
-            if self.marked[row][j] == 1:
-                col = j
+        for pos in self.zeros:
+            i = pos // width
+            if row >= 0 and i != row:
                 break
-
-        return col
-
-    def __find_star_in_col(self, col):
-        """
-        Find the first starred element in the specified row. Returns
-        the row index, or -1 if no starred element was found.
-        """
-        row = -1
-        for i in range(self.n):
-            if self.marked[i][col] == 1:
+            j = pos - i * width
+            if (not row_covered[i]) and (not col_covered[j]):
                 row = i
-                break
-
-        return row
-
-    def __find_prime_in_row(self, row):
-        """
-        Find the first prime element in the specified row. Returns
-        the column index, or -1 if no starred element was found.
-        """
-        col = -1
-        for j in range(self.n):
-            if self.marked[row][j] == 2:
                 col = j
-                break
 
-        return col
+        return (row, col)
 
-    def __convert_path(self, path, count):
-        for i in range(count+1):
-            if self.marked[path[i][0]][path[i][1]] == 1:
-                self.marked[path[i][0]][path[i][1]] = 0
-            else:
-                self.marked[path[i][0]][path[i][1]] = 1
+    def __convert_path(self, count):
+        # Unstar the starred zeros (odd positions) first, then star the
+        # primed zeros (even positions) of the path.
+        for i in range(1, count+1, 2):
+            self.star_in_row[self.path_rows[i]] = -1
+            self.star_in_col[self.path_cols[i]] = -1
+        for i in range(0, count+1, 2):
+            self.star_in_row[self.path_rows[i]] = self.path_cols[i]
+            self.star_in_col[self.path_cols[i]] = self.path_rows[i]
 
     def __clear_covers(self):
         """Clear all covered matrix cells"""
-        for i in range(self.n):
-            self.row_covered[i] = False
-            self.col_covered[i] = False
+        n = self.n
+        self.row_covered[0:n] = self.col_covered[0:n] = [False] * n
 
     def __erase_primes(self):
         """Erase all prime markings"""
-        for i in range(self.n):
-            for j in range(self.n):
-                if self.marked[i][j] == 2:
-                    self.marked[i][j] = 0
+        n = self.n
+        self.prime_in_row[0:n] = [-1] * n
 
 # ---------------------------------------------------------------------------
 # Functions
@@ -1,4 +1,66 @@
 import codecs
+import os
+import re
+
+# (name, pattern of the first bytes, file name extension) of the supported compression formats
+COMPRESSION_FORMATS = [
+    ('gzip', re.compile(b'\x1f\x8b'), '.gz'),
+    ('xz', re.compile(b'\xfd7zXZ\x00'), '.xz'),
+    # "BZh", the block size ('1'-'9') and the magic number of the first block
+    # (or of the end of an empty stream), so that text starting with "BZh" is not mistaken for bzip2
+    ('bzip2', re.compile(b'BZh[1-9](\x31\x41\x59\x26\x53\x59|\x17\x72\x45\x38\x50\x90)'), '.bz2'),
+]
+
+def detect_compression(filename):
+    """Returns the name of the compression format of the given file, detected by
+    its first bytes, or None if the file is not compressed."""
+    with open(filename, 'rb') as f:
+        start = f.read(10)
+    for (name, magic, extension) in COMPRESSION_FORMATS:
+        if magic.match(start):
+            return name
+    return None
+
+def is_po_file(filename):
+    """Returns True if the file name (apart from a compression extension) ends
+    with .po or .pot."""
+    for (name, magic, extension) in COMPRESSION_FORMATS:
+        if filename.endswith(extension):
+            filename = filename[:-len(extension)]
+    return os.path.splitext(filename)[1].lower() in ['.po', '.pot']
+
+def _open_compressed(compression, filename, mode):
+    # The compression modules are only imported when they are needed.
+    if compression == 'gzip':
+        import gzip
+        # No timestamp in the header, so that the same output gives the same file.
+        return gzip.GzipFile(filename, mode, mtime=0)
+    elif compression == 'xz':
+        import lzma
+        return lzma.LZMAFile(filename, mode)
+    else:
+        import bz2
+        return bz2.BZ2File(filename, mode)
+
+def open_file(filename, mode='r', codec='UTF-8'):
+    """Like codecs.open(), but decompresses gzip, xz and bzip2 files (detected by
+    their first bytes) while reading, and compresses the output when writing to a
+    file whose name ends with .gz, .xz or .bz2."""
+    if 'r' in mode:
+        compression = detect_compression(filename)
+    else:
+        compression = next((name for (name, magic, extension) in COMPRESSION_FORMATS
+                            if filename.endswith(extension)), None)
+    if compression is None:
+        return codecs.open(filename, mode, codec)
+
+    info = codecs.lookup(codec)
+    stream = codecs.StreamReaderWriter(
+        _open_compressed(compression, filename, mode.replace('b', '') + 'b'),
+        info.streamreader, info.streamwriter)
+    stream.encoding = codec
+    stream.name = filename
+    return stream
 
 class DeferredFile(object):
     """A file that can be opened with a single open() call, without specifying
@@ -9,8 +71,30 @@ class DeferredFile(object):
         self._mode = mode
         self._codec = codec
 
+    @property
+    def name(self):
+        return self._filename
+
+    @property
+    def encoding(self):
+        return self._codec
+
+    @property
+    def is_template(self):
+        return '{' in self._filename
+
+    def for_input(self, filename):
+        """Returns the file for the given input file if the file name is a template:
+        {name} is replaced by the file name of the input file (without directory),
+        {stem} by the part of it before the first '.'."""
+        if not self.is_template:
+            return self
+        name = os.path.basename(filename)
+        return DeferredFile(self._filename.format(name=name, stem=name.split('.', 1)[0]),
+                            self._mode, self._codec)
+
     def open(self):
-        return codecs.open(self._filename, self._mode, self._codec)
+        return open_file(self._filename, self._mode, self._codec)
 
 # Copied and modified from argparse.py
 class CodecFileType(object):
@@ -41,7 +125,7 @@ class CodecFileType(object):
         if self._deferred:
             return DeferredFile(filename, self._mode, codec)
         else:
-            return codecs.open(filename, self._mode, codec)
+            return open_file(filename, self._mode, codec)
 
     def __repr__(self):
         args = [self._mode, self._default_codec]
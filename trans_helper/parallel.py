@@ -0,0 +1,89 @@
+"""Parallel reading of large Zusi translation files."""
+
+import concurrent.futures
+import itertools
+import logging
+import os
+from array import array
+
+from . import myargparse
+from .translation_helper import TranslationEntry, TranslationFile, gc_paused, iter_zusi
+
+# Files smaller than this are not worth splitting.
+MIN_CHUNK_SIZE = 1 << 20
+
+def chunk_boundaries(filename, chunks, min_chunk_size=MIN_CHUNK_SIZE):
+  """Splits the file into at most the given number of byte ranges (start, end) that begin at the
+  start of a line."""
+  size = os.path.getsize(filename)
+  chunks = max(1, min(chunks, size // min_chunk_size))
+  boundaries = [0]
+  with open(filename, 'rb') as f:
+    for i in range(1, chunks):
+      position = max(size * i // chunks, boundaries[-1])
+      f.seek(position)
+      f.readline() # skip to the start of the next line
+      position = f.tell()
+      if position >= size:
+        break
+      if position > boundaries[-1]:
+        boundaries.append(position)
+  boundaries.append(size)
+  return list(zip(boundaries[:-1], boundaries[1:]))
+
+def _parse_chunk(filename, encoding, start, end, strip_shortcuts):
+  """Returns the entries of a byte range of the file as columns: the number of entries, the keys and the
+  values joined by '\\n' (which they cannot contain), the quote flags as bytes and the numbers of spaces as
+  arrays. Columns are much cheaper to send back to the parent process than entry objects or tuples.
+  The parent looks up the contexts."""
+  with open(filename, 'rb') as f:
+    f.seek(start)
+    data = f.read(end - start)
+  lines = data.decode(encoding).splitlines(True)
+  with gc_paused():
+    entries = list(iter_zusi(lines, {}, strip_shortcuts))
+  return (len(entries), '\n'.join([e.key for e in entries]), '\n'.join([e.value for e in entries]),
+      bytes([e.leftquote for e in entries]), bytes([e.rightquote for e in entries]),
+      array('l', [e.leftspaces for e in entries]), array('l', [e.rightspaces for e in entries]))
+
+def is_splittable(encoding):
+  """Returns True if lines of the given encoding can be split at b'\\n' bytes."""
+  try:
+    return "\n".encode(encoding) == b"\n" and "\nä".encode(encoding, 'replace')[:1] == b"\n"
+  except LookupError:
+    return False
+
+def read_from_zusi_parallel(filename, encoding, contexts, strip_shortcuts=False, jobs=None, translation_file=None,
+    min_chunk_size=MIN_CHUNK_SIZE):
+  """Reads a Zusi translation file into translation_file (a new TranslationFile if None) like
+  TranslationFile.read_from_zusi(), parsing chunks of the file in up to 'jobs' worker processes
+  (default: number of CPUs), each of which gets at least min_chunk_size bytes. The entries are
+  appended in the order of the file.
+
+  The workers decode, split and strip the lines. Creating the entries and indexing them by key stays in this
+  process and takes about 30% of the time of reading the file serially, so the speedup stays below 3x."""
+  if translation_file is None:
+    translation_file = TranslationFile()
+  jobs = jobs or os.cpu_count() or 1
+  # Compressed files cannot be split into byte ranges.
+  ranges = chunk_boundaries(filename, jobs, min_chunk_size) \
+      if is_splittable(encoding) and myargparse.detect_compression(filename) is None else []
+
+  if len(ranges) <= 1:
+    with myargparse.open_file(filename, 'r', encoding) as f:
+      return translation_file.read_from_zusi(f, contexts, strip_shortcuts)
+
+  logging.info("Parsing {} in {} chunks".format(filename, len(ranges)))
+  with concurrent.futures.ProcessPoolExecutor(max_workers=min(jobs, len(ranges))) as executor:
+    futures = [executor.submit(_parse_chunk, filename, encoding, start, end, strip_shortcuts)
+        for (start, end) in ranges]
+    with gc_paused():
+      for future in futures:
+        (count, keys, values, leftquotes, rightquotes, leftspaces, rightspaces) = future.result()
+        if not count:
+          continue
+        keys = keys.split('\n')
+        values = values.split('\n')
+        translation_file.extend(map(TranslationEntry, keys, values, values, map(contexts.get, keys, itertools.repeat('')),
+            map(bool, leftquotes), map(bool, rightquotes), leftspaces, rightspaces))
+  return translation_file
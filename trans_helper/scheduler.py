@@ -0,0 +1,136 @@
+"""Runs a batch of translation helper jobs on several worker processes, longest jobs first."""
+
+import concurrent.futures
+import json
+import logging
+import os
+import shlex
+import time
+
+from . import cli
+
+# Estimated seconds per input byte and per unit of assignment work until timings have been recorded
+DEFAULT_RATE = 2e-6
+# Units of work per cell of the n x n x n Munkres work of a shortcut group, relative to one input byte
+MATRIX_WEIGHT = 0.05
+
+def read_batch_file(f):
+  """Returns the command lines (lists of arguments) of a batch file: one job per line, empty lines and lines
+  starting with '#' are ignored."""
+  jobs = []
+  for line in f:
+    line = line.strip()
+    if len(line) and not line.startswith('#'):
+      jobs.append(shlex.split(line))
+  return jobs
+
+def job_features(args):
+  """Returns a tuple (input bytes, assignment work) for the parsed arguments of a job."""
+  files = [m[0] for m in (args.master or [])] + [c[0] for c in (args.context or [])] \
+      + [f for f in [args.translation, args.po_file, args.shortcut_groups] if f is not None]
+  size = sum(os.path.getsize(f.name) for f in files if os.path.isfile(f.name))
+  matrix = 0
+  if args.mode == 'po2zusi' and args.shortcut_groups is not None:
+    # Munkres needs O(n^3) steps for a group of n entries.
+    from .translation_helper import ShortcutGroupFile
+    shortcuts = ShortcutGroupFile()
+    shortcuts.read_from_file(args.shortcut_groups)
+    matrix = sum(len(group) ** 3 for group in shortcuts.groups)
+  for f in files:
+    f.close()
+  return (size, matrix)
+
+class CostModel(object):
+  """Estimates the run time of jobs from the size of their inputs and the size of their shortcut groups,
+  using the timings of previous runs: a job that ran before is estimated from its own last run time (scaled
+  by the change of its inputs), other jobs by the average time per unit of work of all recorded jobs."""
+
+  def __init__(self, timings=None):
+    self.timings = timings or {} # job key -> {'seconds': ..., 'units': ...}
+
+  @staticmethod
+  def key(argv):
+    return " ".join(argv)
+
+  @staticmethod
+  def units(features):
+    (size, matrix) = features
+    return size + MATRIX_WEIGHT * matrix
+
+  def rate(self):
+    seconds = sum(t['seconds'] for t in self.timings.values())
+    units = sum(t['units'] for t in self.timings.values())
+    return seconds / units if seconds > 0 and units > 0 else DEFAULT_RATE
+
+  def estimate(self, argv, features):
+    units = self.units(features)
+    previous = self.timings.get(self.key(argv))
+    if previous is not None and previous['units'] > 0:
+      return previous['seconds'] * units / previous['units']
+    return self.rate() * units
+
+  def record(self, argv, features, seconds):
+    self.timings[self.key(argv)] = {'seconds': seconds, 'units': self.units(features)}
+
+  @classmethod
+  def load(cls, filename):
+    if filename is None or not os.path.exists(filename):
+      return cls()
+    with open(filename) as f:
+      return cls(json.load(f))
+
+  def save(self, filename):
+    with open(filename + '.tmp', 'w') as f:
+      json.dump(self.timings, f, indent=2, sort_keys=True)
+    os.replace(filename + '.tmp', filename)
+
+def _run_job(argv):
+  """Runs one job in a worker process. Returns a tuple (exit code, seconds)."""
+  start = time.time()
+  try:
+    cli.run(cli.parse_args(argv))
+    code = 0
+  except SystemExit as e:
+    code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+  except Exception:
+    logging.exception("Job failed: {}".format(" ".join(argv)))
+    code = 1
+  return (code, time.time() - start)
+
+def run_batch(jobs, workers=None, timings_file=None):
+  """Runs the given jobs (lists of command line arguments) on the given number of worker processes
+  (default: number of CPUs), longest estimated job first, and records their run times in timings_file.
+  Returns the highest exit code of all jobs."""
+  model = CostModel.load(timings_file)
+  features = []
+  for argv in jobs:
+    try:
+      args = cli.parse_args(argv)
+    except SystemExit:
+      logging.error("Invalid job: {}".format(" ".join(argv)))
+      return 2
+    if args.watch or args.mode == 'batch':
+      logging.error("Jobs cannot use --watch or batch mode: {}".format(" ".join(argv)))
+      return 2
+    features.append(job_features(args))
+  estimates = [model.estimate(argv, f) for (argv, f) in zip(jobs, features)]
+
+  # Longest processing time first: each worker takes the longest job that is left when it becomes free.
+  order = sorted(range(len(jobs)), key=lambda i: -estimates[i])
+  start = time.time()
+  result = 0
+  with concurrent.futures.ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+    futures = dict((executor.submit(_run_job, jobs[i]), i) for i in order)
+    for future in concurrent.futures.as_completed(futures):
+      i = futures[future]
+      (code, seconds) = future.result()
+      logging.info("Finished job {} in {:.2f} s (estimated {:.2f} s), exit code {}: {}".format(
+          i + 1, seconds, estimates[i], code, " ".join(jobs[i])))
+      if code == 0:
+        model.record(jobs[i], features[i], seconds)
+      result = max(result, code)
+  logging.info("Batch of {} job(s) finished in {:.2f} s".format(len(jobs), time.time() - start))
+
+  if timings_file is not None:
+    model.save(timings_file)
+  return result
@@ -0,0 +1,110 @@
+import io
+
+from . import myargparse
+from . import translation_helper
+from .translation_helper import TranslationFile, ShortcutGroupFile
+
+def _read(f, reader):
+  """Calls reader with f, opening f first if it is a file name (optionally with an @codec suffix,
+  as on the command line)."""
+  if isinstance(f, str):
+    with myargparse.CodecFileType('r')(f) as opened:
+      return reader(opened)
+  return reader(f)
+
+def read_zusi_file(f, contexts=None, strip_shortcuts=False):
+  return _read(f, lambda opened: TranslationFile().read_from_zusi(opened,
+      contexts if contexts is not None else {}, strip_shortcuts))
+
+def read_po_file(f):
+  return _read(f, lambda opened: TranslationFile().read_from_po(opened, include_fuzzy=False))
+
+class TranslationSession(object):
+  """Library interface to the translation helper.
+
+  Master files, contexts and shortcut groups are parsed once when the session is created and can then
+  be used for any number of conversions. Files can be given as file objects or as file names
+  (optionally with an @codec suffix). Translations and PO files can also be given as already parsed
+  TranslationFile objects, which makes it possible to reuse them across calls as well.
+
+  The to_*() methods return iterators over the lines of the output file, the write_*() methods
+  write them to a file-like object, and the *_string() methods return the whole output as a string.
+  Errors are reported as TranslationException; the session never exits the interpreter."""
+
+  def __init__(self, masters, contexts=(), shortcut_groups=None, strip_shortcuts=False,
+      approximate_threshold=None, approximate_time_budget=1.0, compact_threshold=None):
+    self.contexts = {}
+    for f in contexts:
+      _read(f, lambda opened: translation_helper.read_context_file(opened, self.contexts))
+
+    self.master_file = TranslationFile()
+    for f in masters:
+      _read(f, lambda opened: self.master_file.read_from_zusi(opened, self.contexts, strip_shortcuts = strip_shortcuts))
+
+    self.shortcuts = ShortcutGroupFile(approximate_threshold, approximate_time_budget, compact_threshold)
+    if shortcut_groups is not None:
+      _read(shortcut_groups, self.shortcuts.read_from_file)
+
+    # The master entries that need a shortcut do not depend on the target language.
+    self.shortcut_candidates = [self.shortcuts.get_candidates(group, self.master_file) for group in self.shortcuts.groups]
+    # Shortcut assignments of unchanged groups are reused across to_zusi() calls.
+    from . import assignment
+    self.shortcut_cache = assignment.LRUCache()
+
+  def clear_caches(self):
+    """Forgets the shortcut assignments of earlier to_zusi() calls and the solutions in the assignment memo
+    shared by the process."""
+    from . import assignment
+    self.shortcut_cache.clear()
+    assignment.memo.clear()
+
+  def _translation_file(self, f, reader):
+    if f is None:
+      return TranslationFile()
+    if isinstance(f, TranslationFile):
+      return f
+    return reader(f)
+
+  def to_pot(self, memory=None, memory_threshold=0.7):
+    """memory is an optional TranslationMemory used for fuzzy suggestions."""
+    return translation_helper.iter_po('zusi2pot', self.master_file, TranslationFile(), memory, memory_threshold)
+
+  def to_po(self, translation, memory=None, memory_threshold=0.7):
+    """translation is an existing Zusi translation file of the target language."""
+    existing_translation = self._translation_file(translation, read_zusi_file)
+    return translation_helper.iter_po('zusi2po', self.master_file, existing_translation, memory, memory_threshold)
+
+  def to_zusi(self, po, translation=None):
+    """po is the PO file of the target language, translation an optional existing Zusi translation
+    file whose shortcuts are reused as much as possible."""
+    po_file = self._translation_file(po, read_po_file)
+    existing_translation = self._translation_file(translation, read_zusi_file)
+    shortcuts_by_key = self.shortcuts.generate_shortcuts(self.master_file, po_file, existing_translation,
+        cache=self.shortcut_cache, candidates=self.shortcut_candidates)
+    for (master_entry, value) in translation_helper.iter_zusi_values(self.master_file, po_file,
+        self.shortcuts, shortcuts_by_key):
+      yield translation_helper.format_zusi_line(master_entry, value)
+
+  def write_pot(self, outfile, memory=None, memory_threshold=0.7):
+    outfile.writelines(self.to_pot(memory, memory_threshold))
+
+  def write_po(self, outfile, translation, memory=None, memory_threshold=0.7):
+    outfile.writelines(self.to_po(translation, memory, memory_threshold))
+
+  def write_zusi(self, outfile, po, translation=None):
+    outfile.writelines(self.to_zusi(po, translation))
+
+  def pot_string(self, memory=None, memory_threshold=0.7):
+    out = io.StringIO()
+    self.write_pot(out, memory, memory_threshold)
+    return out.getvalue()
+
+  def po_string(self, translation, memory=None, memory_threshold=0.7):
+    out = io.StringIO()
+    self.write_po(out, translation, memory, memory_threshold)
+    return out.getvalue()
+
+  def zusi_string(self, po, translation=None):
+    out = io.StringIO()
+    self.write_zusi(out, po, translation)
+    return out.getvalue()
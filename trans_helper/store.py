@@ -0,0 +1,158 @@
+"""SQLite database with the entries of the master, Zusi and PO files of all languages."""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+
+from . import myargparse
+from .build_cache import file_digest
+from .translation_helper import TranslationException, TranslationFile, iter_zusi
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+  id INTEGER PRIMARY KEY,
+  path TEXT NOT NULL UNIQUE,
+  kind TEXT NOT NULL, -- 'master', 'zusi' or 'po'
+  language TEXT NOT NULL, -- file name up to the first '.', e.g. 'english'
+  digest TEXT NOT NULL -- of the content, and for master files also of the contexts
+);
+CREATE TABLE IF NOT EXISTS entries (
+  id INTEGER PRIMARY KEY,
+  file_id INTEGER NOT NULL REFERENCES files(id),
+  position INTEGER NOT NULL,
+  key TEXT NOT NULL,
+  value TEXT NOT NULL,
+  source TEXT, -- source text (master and PO files only)
+  context TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_file ON entries(file_id, position);
+CREATE INDEX IF NOT EXISTS entries_key ON entries(key);
+CREATE INDEX IF NOT EXISTS entries_source ON entries(source);
+CREATE INDEX IF NOT EXISTS entries_context ON entries(context);
+CREATE TABLE IF NOT EXISTS settings (
+  name TEXT PRIMARY KEY,
+  value TEXT
+);
+"""
+
+# Only created if SQLite supports FTS5
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(value, source, content='entries', content_rowid='id');
+"""
+
+def _entry_rows(kind, f, contexts):
+  """Yields tuples (position, key, value, source, context) for the entries of the open file f."""
+  if kind == 'po':
+    for (position, e) in enumerate(TranslationFile().read_from_po(f)):
+      yield (position, e.key, e.value, getattr(e, 'src_value', None), e.context)
+  else:
+    for (position, e) in enumerate(iter_zusi(f, contexts if kind == 'master' else {})):
+      yield (position, e.key, e.value, e.value if kind == 'master' else None, e.context)
+
+def contexts_digest(contexts):
+  return hashlib.sha256(json.dumps(sorted(contexts.items())).encode('utf-8')).hexdigest()
+
+class TranslationStore(object):
+  """Imports translation files into an SQLite database and answers queries over all of them.
+
+  Each file is stored with the digest of its content (and for master files, of the contexts), so importing it
+  again only replaces its entries if it or the contexts changed. The entries are indexed by key, source text and context, and their values and source texts by
+  a full-text index if SQLite supports FTS5. Files imported without FTS5 are added to the full-text index
+  the next time the database is opened with FTS5."""
+
+  def __init__(self, filename):
+    self.connection = sqlite3.connect(filename)
+    self.connection.executescript(SCHEMA)
+    self.has_fts = self._create_fts()
+
+  def _create_fts(self):
+    cursor = self.connection.cursor()
+    existed = cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'entries_fts'").fetchone() is not None
+    try:
+      self.connection.executescript(FTS_SCHEMA)
+      cursor.execute("SELECT rowid FROM entries_fts LIMIT 0")
+    except sqlite3.OperationalError:
+      logging.info("SQLite does not support FTS5, full-text search is not available")
+      return False
+    stale = cursor.execute("SELECT 1 FROM settings WHERE name = 'fts_stale'").fetchone() is not None
+    if stale or not existed:
+      with self.connection:
+        cursor.execute("INSERT INTO entries_fts (entries_fts) VALUES ('rebuild')")
+        cursor.execute("DELETE FROM settings WHERE name = 'fts_stale'")
+    return True
+
+  def close(self):
+    self.connection.close()
+
+  def import_files(self, files, contexts=None):
+    """Imports the given open files, a list of tuples (kind, file) where kind is 'master', 'zusi' or 'po',
+    in one transaction. Returns the number of files that were (re-)imported."""
+    imported = 0
+    with self.connection:
+      for (kind, f) in files:
+        if self._import_file(kind, f, contexts or {}):
+          imported += 1
+    return imported
+
+  def _import_file(self, kind, f, contexts):
+    path = os.path.abspath(f.name)
+    digest = file_digest(f.name)
+    if kind == 'master':
+      # The contexts of its entries come from the context files
+      digest += ':' + contexts_digest(contexts)
+    cursor = self.connection.cursor()
+    row = cursor.execute("SELECT id, kind, digest FROM files WHERE path = ?", (path,)).fetchone()
+    if row is not None and row[1:] == (kind, digest):
+      logging.info("{} is unchanged".format(f.name))
+      return False
+
+    logging.info("Importing {}".format(f.name))
+    language = os.path.basename(f.name).split('.', 1)[0]
+    if row is None:
+      file_id = cursor.execute("INSERT INTO files (path, kind, language, digest) VALUES (?, ?, ?, ?)",
+          (path, kind, language, digest)).lastrowid
+    else:
+      file_id = row[0]
+      if self.has_fts:
+        cursor.execute("INSERT INTO entries_fts (entries_fts, rowid, value, source) "
+            + "SELECT 'delete', id, value, source FROM entries WHERE file_id = ?", (file_id,))
+      cursor.execute("DELETE FROM entries WHERE file_id = ?", (file_id,))
+      cursor.execute("UPDATE files SET kind = ?, language = ?, digest = ? WHERE id = ?",
+          (kind, language, digest, file_id))
+
+    cursor.executemany("INSERT INTO entries (file_id, position, key, value, source, context) VALUES (?, ?, ?, ?, ?, ?)",
+        ((file_id,) + row for row in _entry_rows(kind, f, contexts)))
+    if self.has_fts:
+      cursor.execute("INSERT INTO entries_fts (rowid, value, source) SELECT id, value, source FROM entries WHERE file_id = ?",
+          (file_id,))
+    else:
+      cursor.execute("INSERT OR REPLACE INTO settings (name, value) VALUES ('fts_stale', '1')")
+    return True
+
+  def translations(self, key):
+    """Returns a list of tuples (language, kind, value) for all entries with the given key."""
+    return self.connection.execute("SELECT f.language, f.kind, e.value FROM entries e JOIN files f ON f.id = e.file_id "
+        + "WHERE e.key = ? ORDER BY f.language, e.position", (key,)).fetchall()
+
+  def keys_with_source(self, source):
+    """Returns a sorted list of tuples (key, context) of the entries with the given source text."""
+    return self.connection.execute("SELECT DISTINCT key, context FROM entries WHERE source = ? ORDER BY key, context",
+        (source,)).fetchall()
+
+  def search(self, query, limit=100):
+    """Returns a list of tuples (language, kind, key, value) for the entries whose value or source text
+    matches the given full-text query (SQLite FTS5 syntax), best matches first. Raises a
+    TranslationException if the query is invalid or full-text search is not available."""
+    if not self.has_fts:
+      raise TranslationException("Full-text search is not available: SQLite does not support FTS5")
+    try:
+      return self.connection.execute("SELECT f.language, f.kind, e.key, e.value FROM entries_fts "
+        + "JOIN entries e ON e.id = entries_fts.rowid JOIN files f ON f.id = e.file_id "
+          + "WHERE entries_fts MATCH ? ORDER BY entries_fts.rank LIMIT ?", (query, limit)).fetchall()
+    except sqlite3.OperationalError as e:
+      raise TranslationException("Invalid search query '%s': %s" % (query, e))
+
+def file_kind(f):
+  return 'po' if myargparse.is_po_file(f.name) else 'zusi'
@@ -1,18 +1,65 @@
-import argparse
 import os
 import sys
 import re
+import itertools
+import contextlib
+import gc
 from collections import defaultdict
+from array import array
 
 import logging
-logging.basicConfig(level=logging.INFO)
 
 linesep = '\r\n' # make it Windows compatible
 
+shortcut_re = re.compile(r'(?<!&)&(?!&)') # negative lookbehind and lookahead
+
+shortcut_letters = "abcdefghijklmnopqrstuvwxyz"
+
+# Encodings (normalized codec names) in which every decoded text can be encoded
+unicode_encodings = frozenset(['utf-8', 'utf-8-sig', 'utf-16', 'utf-16-le', 'utf-16-be', 'utf-32', 'utf-32-le', 'utf-32-be'])
+# char -> (char is upper-case or uncased, lower-cased char); filled on demand for non-ASCII characters
+shortcut_char_classes = dict((chr(c), (chr(c).upper() == chr(c), chr(c).lower())) for c in range(128))
+
 class TranslationException(Exception):
   def __str__(self):
     return repr(self.args[0])
 
+class TranslationConflict:
+  """A source text of the master file (with context) for which an existing translation file
+  contains no translation or more than one different translation."""
+  def __init__(self, value, context, keys, candidates):
+    self.value = value
+    self.context = context
+    self.keys = keys # keys of the master entries with this source text and context
+    self.candidates = candidates # translated value -> list of keys that have this translation
+
+  def __str__(self):
+    message = ["Error: %d translations found for text '%s', context '%s', with the following set of keys:"
+        % (len(self.candidates), self.value, self.context)]
+    for key in self.keys:
+      message.append("  %s" % key)
+    if len(self.candidates) > 0:
+      message.append("Possible translations:")
+      for (possible_translation, keys) in self.candidates.items():
+        message.append("  '%s'" % possible_translation)
+        for key in keys:
+          message.append("    %s" % key)
+    return "\n".join(message)
+
+class TranslationConflictException(TranslationException):
+  def __init__(self, conflicts):
+    TranslationException.__init__(self, "\n".join([str(c) for c in conflicts]
+        + ["%d source text(s) without a unique translation" % len(conflicts)]))
+    self.conflicts = conflicts
+
+class UnencodableException(TranslationException):
+  def __init__(self, errors, encoding):
+    TranslationException.__init__(self, "\n".join(["%s = '%s' cannot be written in encoding %s, characters: %s"
+        % (master_entry.key, value, encoding, ", ".join(["'%s' (U+%04X)" % (c, ord(c)) for c in characters]))
+        for (master_entry, value, characters) in errors]
+        + ["%d entries cannot be written in encoding %s" % (len(errors), encoding)]))
+    self.errors = errors
+
 class TranslationEntry:
   def __init__(self, key, value='', source_value='', context='',
       leftquote='', rightquote='', leftspaces=0, rightspaces=0):
@@ -24,6 +71,7 @@ class TranslationEntry:
     self.rightquote = rightquote
     self.leftspaces = leftspaces
     self.rightspaces = rightspaces
+    self.fuzzy = False
 
   def __str__(self):
     return "'%s' [%s] = '%s'" % (self.key, self.context, self.value)
@@ -31,6 +79,39 @@ class TranslationEntry:
   def __repr__(self):
     return self.__str__()
 
+@contextlib.contextmanager
+def gc_paused():
+  """Pauses the cyclic garbage collector while many entries are created. Entries do not form reference
+  cycles, but the collections triggered by allocating them would take most of the time of reading a file."""
+  enabled = gc.isenabled()
+  gc.disable()
+  try:
+    yield
+  finally:
+    if enabled:
+      gc.enable()
+
+def iter_zusi(f, contexts, strip_shortcuts = False):
+  """Yields the entries of a Zusi translation file one at a time."""
+  for line in f:
+    try:
+      (key, value) = line.strip("\r\n").split(" = ", 1)
+    except ValueError:
+      continue
+    leftspaces = len(value) - len(value.lstrip(" "))
+    rightspaces = len(value) - len(value.rstrip(" "))
+    value = value.strip(" ")
+    leftquote = len(value) > 0 and value[0] == "'"
+    rightquote = len(value) > 1 and value[-1] == "'"
+    value = value.strip("'")
+    if strip_shortcuts and ('Caption' in key or 'Text' in key):
+      value = shortcut_re.sub('', value)
+    try:
+      context = contexts[key]
+    except KeyError:
+      context = ''
+    yield TranslationEntry(key, value, value, context, leftquote, rightquote, leftspaces, rightspaces)
+
 class TranslationFile:
   def __init__(self):
     # Entries by key. Multiple entries may have the same key
@@ -42,33 +123,36 @@ class TranslationFile:
   def __iter__(self):
     return iter(self.entries_in_order)
 
+  def __contains__(self, key):
+    return key in self.entries
+
+  def __getitem__(self, key):
+    """Returns the set of entries with the given key."""
+    if key not in self.entries:
+      raise KeyError(key)
+    return self.entries[key]
+
   def append(self, entry):
     self.entries[entry.key].add(entry)
     self.entries_in_order.append(entry)
 
+  def extend(self, entries):
+    """Appends the given iterable of entries."""
+    start = len(self.entries_in_order)
+    self.entries_in_order.extend(entries)
+    index = self.entries
+    for entry in itertools.islice(self.entries_in_order, start, None):
+      index[entry.key].add(entry)
+
   def read_from_zusi(self, f, contexts, strip_shortcuts = False):
-    for line in f:
-      try:
-        (key, value) = line.strip("\r\n").split(" = ", 1)
-      except ValueError:
-        continue
-      leftspaces = len(value) - len(value.lstrip(" "))
-      rightspaces = len(value) - len(value.rstrip(" "))
-      value = value.strip(" ")
-      leftquote = len(value) > 0 and value[0] == "'"
-      rightquote = len(value) > 1 and value[-1] == "'"
-      value = value.strip("'")
-      if strip_shortcuts and ('Caption' in key or 'Text' in key):
-        value = re.sub(r'(?<!&)&(?!&)', '', value) # negative lookbehind and lookahead
-      try:
-        context = contexts[key]
-      except KeyError:
-        context = ''
-      self.append(TranslationEntry(key, value, value, context, leftquote, rightquote, leftspaces, rightspaces))
+    with gc_paused():
+      self.extend(iter_zusi(f, contexts, strip_shortcuts))
 
     return self
 
-  def read_from_po(self, f):
+  def read_from_po(self, f, include_fuzzy=True):
+    """Reads a PO file. Entries with the 'fuzzy' flag have their fuzzy attribute set; if include_fuzzy
+    is false, they are treated as untranslated (like msgfmt does), i.e. their value is empty."""
     MODE_MSGID = 1
     MODE_MSGSTR = 2
     MODE_MSGCTXT = 3
@@ -77,8 +161,16 @@ class TranslationFile:
     current_msgid = ''
     current_context = ''
     current_value = ''
+    current_fuzzy = False
     entries_under_construction = set()
 
+    def finish_entries():
+      for entry in entries_under_construction:
+        entry.context = current_context
+        entry.value = '' if current_fuzzy and not include_fuzzy else current_value
+        entry.src_value = current_msgid
+        entry.fuzzy = current_fuzzy
+
     for line in f:
       line = line.strip("\r\n")
       if line.startswith("#"):
@@ -86,6 +178,8 @@ class TranslationFile:
           entry = TranslationEntry(line[9:])
           self.append(entry)
           entries_under_construction.add(entry)
+        elif line.startswith("#,") and 'fuzzy' in [flag.strip() for flag in line[2:].split(",")]:
+          current_fuzzy = True
       elif line.startswith("msgid"):
         current_msgid = unescape_po(line[7:-1])
         current_mode = MODE_MSGID
@@ -106,21 +200,17 @@ class TranslationFile:
       elif line == '':
         # Do not write the special translation (charset etc.) for msgid ""
         if current_msgid != '':
-          for entry in entries_under_construction:
-            entry.context = current_context
-            entry.value = current_value
-            entry.src_value = current_msgid
+          finish_entries()
         entries_under_construction = set()
         current_mode = 0
         current_msgid = ''
         current_context = ''
         current_value = ''
+        current_fuzzy = False
 
     # Write last entry even if the file does not end with a blank line.
     if current_msgid != '':
-      for entry in entries_under_construction:
-        entry.context = current_context
-        entry.value = current_value
+      finish_entries()
 
     return self
 
@@ -147,9 +237,16 @@ class TranslationFile:
                 (e.value, e.src_value) for e in matching_entries])))
 
 class ShortcutGroupFile:
-  def __init__(self):
+  def __init__(self, approximate_threshold=None, approximate_time_budget=1.0, compact_threshold=None):
     self.groups = [] # list of sets of keys that form one shortcut group
     self.key_to_group = {}
+    self.solver = None # Munkres instance, reused for all groups
+    self.compact_solver = None # Munkres instance with compact work buffers
+    # Groups (connected components) with at least this many entries are solved approximately
+    self.approximate_threshold = approximate_threshold
+    self.approximate_time_budget = approximate_time_budget
+    # Groups with at least this many entries keep their cost matrix in compact arrays
+    self.compact_threshold = compact_threshold
 
   def read_from_file(self, f):
     cur_set = set()
@@ -178,10 +275,10 @@ class ShortcutGroupFile:
       result = 500 if string[pos].upper() == string[pos] else 600
     else:
       result = 700 if string[pos].upper() == string[pos] else 800
-    if source_shortcut not in "abcdefghijklmnopqrstuvwxyz" and string[pos].lower() == source_shortcut:
+    if source_shortcut not in shortcut_letters and string[pos].lower() == source_shortcut:
       # Favor "special" source shortcuts
       result -= 500
-    if string[pos].lower() not in "abcdefghijklmnopqrstuvwxyz" + source_shortcut:
+    if string[pos].lower() not in shortcut_letters + source_shortcut:
       # Do not select special characters like '(', ',', ')' if not necessary
       result += 500
     # Do not change existing translated shortcuts if possible
@@ -198,6 +295,24 @@ class ShortcutGroupFile:
       start = string.find(char, start+1)
     return 9999 if not len(occurrences) else min(self.get_shortcut_weight(string, pos, source_shortcut, existing_shortcut) for pos in occurrences)
 
+  def find_collisions(self, entries):
+    """Returns a list of tuples (group, shortcut, keys) for each shortcut that is used by more than one key
+    of a shortcut group in the given entries (any iterable of TranslationEntry, e.g. iter_zusi()).
+    Each entry is looked at once."""
+    used = {} # (id of group, shortcut) -> (group, keys)
+    for entry in entries:
+      group = self.key_to_group.get(entry.key)
+      if group is None or ('Caption' not in entry.key and 'Text' not in entry.key):
+        # See get_group_rows()
+        continue
+      shortcut = self.get_shortcut(entry.value)
+      if shortcut is None:
+        continue
+      (_, keys) = used.setdefault((id(group), shortcut), (group, []))
+      if entry.key not in keys:
+        keys.append(entry.key)
+    return [(group, shortcut, keys) for ((_, shortcut), (group, keys)) in used.items() if len(keys) > 1]
+
   def add_shortcut(self, string, shortcut):
     """Inserts an '&' before an occurrence of 'shortcut' in the specified string and returns the result.
     shortcut must be a lower-case letter that occurs in the (lowercased) string"""
@@ -218,7 +333,159 @@ class ShortcutGroupFile:
       raise Exception('Shortcut %s not found in string %s' % (shortcut, string))
     return string[:position] + '&' + string[position:]
 
-  def generate_shortcuts(self, master_file, translation_file, existing_translation):
+  def get_candidates(self, group, master_file):
+    """Returns a list of tuples (master entry, source shortcut) for all entries of the given group
+    that need a shortcut. This only depends on the master file, see master_index."""
+    candidates = []
+    for key in group:
+      if ('Caption' not in key and 'Text' not in key) or key not in master_file.entries:
+        # Ampersands are only used for shortcuts in UI element captions. In other, application-internal texts,
+        # it occurs unescaped.
+        continue
+      for master_entry  in master_file.entries[key]:
+        source_shortcut = self.get_shortcut(master_entry.value)
+        if source_shortcut is not None:
+          candidates.append((master_entry, source_shortcut))
+    return candidates
+
+  def get_group_rows(self, candidates, translation_file, existing_translation):
+    """Returns a list of tuples (translated entry, source shortcut, existing shortcut) for the
+    candidates of a group returned by get_candidates()."""
+    rows = []
+    for (master_entry, source_shortcut) in candidates:
+      translated_entry = translation_file.get_translated_entry(master_entry)
+      existing_shortcut = None
+      try:
+        existing_shortcut = self.get_shortcut(existing_translation.get_translated_entry(master_entry).value)
+      except TranslationException:
+        pass
+      rows.append((translated_entry, source_shortcut, existing_shortcut))
+    return rows
+
+  def get_min_shortcut_weights(self, string, source_shortcut, existing_shortcut):
+    """Returns a dict char -> get_min_shortcut_weight(string, char, source_shortcut, existing_shortcut)
+    for all characters of string, computed in a single pass over the string."""
+    special_source_shortcut = source_shortcut not in shortcut_letters
+    allowed = shortcut_letters + source_shortcut
+    weights = {}
+    word_start = True
+    for (pos, char) in enumerate(string):
+      try:
+        (is_upper, lower) = shortcut_char_classes[char]
+      except KeyError:
+        (is_upper, lower) = shortcut_char_classes[char] = (char.upper() == char, char.lower())
+      # Same rules as get_shortcut_weight()
+      if word_start:
+        result = 500 if is_upper else 600
+      else:
+        result = 700 if is_upper else 800
+      if special_source_shortcut and lower == source_shortcut:
+        result -= 500
+      if lower not in allowed:
+        result += 500
+      if lower == existing_shortcut:
+        result = 0
+      result += pos // 10
+      if char not in weights or result < weights[char]:
+        weights[char] = result
+      word_start = char in " -_+"
+    return weights
+
+  def get_cost_matrix(self, rows, compact=False):
+    """Returns a tuple (sorted list of letters, cost matrix) for the rows returned by get_group_rows().
+    matrix[i][j] is the weight of letter j for row i (9999 if the letter does not occur).
+
+    If compact is true, the rows of the matrix are arrays of 16-bit integers (or larger if needed),
+    which are built one at a time, so the weights of all rows are never held at once."""
+    if compact:
+      letterset = set()
+      for (entry, source_shortcut, existing_shortcut) in rows:
+        letterset.update(entry.value.lower())
+      letterset.discard(' ')
+      letterset = sorted(letterset)
+      matrix = []
+      for (entry, source_shortcut, existing_shortcut) in rows:
+        row_weights = self.get_min_shortcut_weights(entry.value.lower(), source_shortcut, existing_shortcut)
+        row = [row_weights.get(c, 9999) for c in letterset]
+        try:
+          matrix.append(array('H', row))
+        except OverflowError:
+          matrix.append(array('l', row))
+      return (letterset, matrix)
+
+    weights = []
+    letterset = set()
+    for (entry, source_shortcut, existing_shortcut) in rows:
+      row_weights = self.get_min_shortcut_weights(entry.value.lower(), source_shortcut, existing_shortcut)
+      weights.append(row_weights)
+      letterset.update(row_weights)
+    letterset.discard(' ')
+    letterset = sorted(letterset)
+    return (letterset, [[row_weights.get(c, 9999) for c in letterset] for row_weights in weights])
+
+  def get_existing_shortcuts(self, rows):
+    """Returns a dict key -> shortcut letter for the rows returned by get_group_rows() if the existing
+    shortcuts of all rows still occur in their translated texts and are different from each other
+    (so the group does not need to be solved), or None."""
+    result = {}
+    used = set()
+    for (entry, source_shortcut, existing_shortcut) in rows:
+      if not existing_shortcut or existing_shortcut == ' ' or existing_shortcut in used \
+          or existing_shortcut not in entry.value.lower():
+        return None
+      used.add(existing_shortcut)
+      result[entry.key] = existing_shortcut
+    return result
+
+  def solve_group(self, rows):
+    """Returns a dict key -> shortcut letter for the rows returned by get_group_rows()."""
+    result = {}
+    compact = self.compact_threshold is not None and len(rows) >= self.compact_threshold
+    (letterset, matrix) = self.get_cost_matrix(rows, compact)
+
+    from . import assignment
+    from . import munkres
+    if compact:
+      if self.compact_solver is None:
+        self.compact_solver = munkres.Munkres(compact=True)
+      solver = self.compact_solver
+      solver.peak_memory = 0
+    else:
+      if self.solver is None:
+        self.solver = munkres.Munkres()
+      solver = self.solver
+    indexes = assignment.solve(matrix, solver=solver, approximate_threshold=self.approximate_threshold,
+        time_budget=self.approximate_time_budget)
+    if compact:
+      logging.info("Shortcut group with {} entries and {} letters: cost matrix {} KiB, solver work buffers {} KiB".format(
+          len(rows), len(letterset), (sys.getsizeof(matrix) + sum(sys.getsizeof(row) for row in matrix)) // 1024,
+          solver.peak_memory // 1024))
+
+    assigned = set()
+    for (entry_idx, letter_idx) in indexes:
+      (entry, source_shortcut, existing_shortcut) = rows[entry_idx]
+
+      if matrix[entry_idx][letter_idx] == 9999:
+        raise TranslationException("No conflict-free shortcut could be found for %s (translation of key %s)" % (entry.value, entry.key))
+
+      result[entry.key] = letterset[letter_idx]
+      assigned.add(entry_idx)
+
+    if len(rows) <= len(letterset):
+      # Solving the whole group at once would have assigned a letter to every entry,
+      # so entries that are left over cannot get a conflict-free shortcut.
+      for (entry_idx, (entry, source_shortcut, existing_shortcut)) in enumerate(rows):
+        if entry_idx not in assigned:
+          raise TranslationException("No conflict-free shortcut could be found for %s (translation of key %s)" % (entry.value, entry.key))
+
+    return result
+
+  def generate_shortcuts(self, master_file, translation_file, existing_translation, cache=None, candidates=None):
+    """Returns a dict key -> shortcut letter for all shortcut groups.
+    If a cache dict is given, groups whose entries did not change since a previous call
+    with the same cache reuse the previous assignment.
+    candidates is an optional list with the result of get_candidates() for each group (e.g. from a
+    master_index.MasterIndex); if given, master_file is not used."""
     result = {}
 
     if len(existing_translation.entries):
@@ -231,51 +498,36 @@ class ShortcutGroupFile:
     # at the start of a word, is an upper-case letter or is a special character
     # like a number that is also a shortcut in the original text).
 
-    for group in self.groups:
+    if candidates is None:
       # Find out which entries of the master file have shortcuts at all
-      entries_with_shortcuts = [] # tuple (translated entry, source shortcut, existing shortcut)
-      matrix = []
-      letterset = set()
-      for key in group:
-        if ('Caption' not in key and 'Text' not in key) or key not in master_file.entries:
-          # Ampersands are only used for shortcuts in UI element captions. In other, application-internal texts,
-          # it occurs unescaped.
-          continue
-        for master_entry  in master_file.entries[key]:
-          source_shortcut = self.get_shortcut(master_entry.value)
-          if source_shortcut is None:
-            continue
-          translated_entry = translation_file.get_translated_entry(master_entry)
-          existing_shortcut = None
-          try:
-            existing_shortcut = self.get_shortcut(existing_translation.get_translated_entry(master_entry).value)
-          except TranslationException:
-            pass
-          entries_with_shortcuts.append((translated_entry, source_shortcut, existing_shortcut))
-          for char in translated_entry.value.lower():
-            if char != ' ':
-              letterset.add(char)
-
-      if not len(entries_with_shortcuts):
-        continue
-
-      letterset = sorted(letterset)
+      candidates = [self.get_candidates(group, master_file) for group in self.groups]
 
-      for (entry, source_shortcut, existing_shortcut) in entries_with_shortcuts:
-        value = entry.value.lower()
-        matrix.append([self.get_min_shortcut_weight(value, c, source_shortcut, existing_shortcut) for c in letterset])
+    for group_candidates in candidates:
+      rows = self.get_group_rows(group_candidates, translation_file, existing_translation)
+      if not len(rows):
+        continue
 
-      from . import munkres
-      m = munkres.Munkres()
-      indexes = m.compute(matrix)
+      # Keep the shortcuts of the existing translation if they are free of conflicts.
+      existing_shortcuts = self.get_existing_shortcuts(rows)
+      if existing_shortcuts is not None:
+        result.update(existing_shortcuts)
+        continue
 
-      for (entry_idx, letter_idx) in indexes:
-        (entry, source_shortcut, existing_shortcut) = entries_with_shortcuts[entry_idx]
+      if cache is None:
+        result.update(self.solve_group(rows))
+        continue
 
-        if matrix[entry_idx][letter_idx] == 9999:
-          raise TranslationException("No conflict-free shortcut could be found for %s (translation of key %s)" % (entry.value, entry.key))
+      signature = tuple((entry.key, entry.value, source_shortcut, existing_shortcut)
+          for (entry, source_shortcut, existing_shortcut) in rows)
+      try:
+        group_shortcuts = cache[signature]
+      except KeyError:
+        group_shortcuts = cache[signature] = self.solve_group(rows)
+      result.update(group_shortcuts)
 
-        result[entry.key] = letterset[letter_idx]
+    if len(self.groups):
+      from . import assignment
+      assignment.memo.log_statistics()
 
     return result
 
@@ -295,121 +547,383 @@ def read_context_file(f, contexts):
 def get_empty_string_entry():
   return TranslationEntry("", "", "", False, False, 0, 0)
 
+def read_contexts(context_files):
+  contexts = {}
+  if context_files is not None:
+    for context_file in context_files:
+      logging.info("Reading context file {}".format(context_file[0].name))
+      read_context_file(context_file[0], contexts)
+  return contexts
+
+def read_zusi_file(f, contexts, strip_shortcuts=False, jobs=None, translation_file=None):
+  """Reads the given open Zusi file into translation_file (a new TranslationFile if None).
+  If jobs > 1, the file is parsed in chunks by that many worker processes."""
+  if translation_file is None:
+    translation_file = TranslationFile()
+  if jobs is not None and jobs > 1 and os.path.isfile(f.name):
+    from . import parallel
+    f.close()
+    return parallel.read_from_zusi_parallel(f.name, f.encoding, contexts, strip_shortcuts, jobs, translation_file)
+  return translation_file.read_from_zusi(f, contexts, strip_shortcuts = strip_shortcuts)
+
+def read_masters(master_files, contexts, strip_shortcuts=False, jobs=None):
+  master_file = TranslationFile()
+  for m in master_files:
+    logging.info("Reading master translation file {}".format(m[0].name))
+    read_zusi_file(m[0], contexts, strip_shortcuts, jobs, master_file)
+  return master_file
+
+def join_translations(master_entries_by_value, existing_translation):
+  """Joins groups of master entries with the same source text and context (a dict (value, context) ->
+  list of entries) with an existing translation file by key.
+  Returns a tuple (dict (value, context) -> translated value, list of TranslationConflict) where the
+  conflicts are the groups that have no translation or more than one different translation."""
+  translations = {}
+  conflicts = []
+  existing_entries = existing_translation.entries
+  for ((value, context), entries) in master_entries_by_value.items():
+    candidates = {} # translated value -> keys
+    for entry in entries:
+      for translated_entry in existing_entries.get(entry.key, ()):
+        candidates.setdefault(translated_entry.value, []).append(translated_entry.key)
+    if len(candidates) == 1:
+      translations[(value, context)] = next(iter(candidates))
+    else:
+      conflicts.append(TranslationConflict(value, context, [entry.key for entry in entries], candidates))
+  return (translations, conflicts)
+
+def iter_po(mode, master_file, existing_translation, memory=None, memory_threshold=0.7):
+  """Yields the lines of a .pot (mode 'zusi2pot') or .po (mode 'zusi2po') file for the given master file.
+  In zusi2po mode, a TranslationConflictException listing all conflicts is raised before the first line
+  if a source text does not have exactly one translation in existing_translation.
+
+  If a TranslationMemory is given, source texts without a translation get the translation of the most
+  similar source text in the memory (if any) as a fuzzy suggestion. In zusi2po mode, the resolved
+  translations are added to the memory."""
+  master_entries_by_value = defaultdict(list)
+  for entry in master_file:
+    master_entries_by_value[(entry.value, entry.context)].append(entry)
+
+  suggestions = {} # (value, context) -> (similarity, source text, translation) from the memory
+  if mode == 'zusi2po':
+    (translations, conflicts) = join_translations(master_entries_by_value, existing_translation)
+    if memory is not None:
+      for conflict in conflicts:
+        if not len(conflict.candidates):
+          suggestion = memory.lookup(conflict.value, memory_threshold)
+          if suggestion is not None:
+            suggestions[(conflict.value, conflict.context)] = suggestion
+      conflicts = [c for c in conflicts if (c.value, c.context) not in suggestions]
+    if len(conflicts):
+      raise TranslationConflictException(conflicts)
+    if memory is not None:
+      for ((value, context), translation) in translations.items():
+        memory.add(value, translation)
+  elif memory is not None:
+    for (value, context) in master_entries_by_value:
+      suggestion = memory.lookup(value, memory_threshold)
+      if suggestion is not None:
+        suggestions[(value, context)] = suggestion
+
+  # Print the entry for the empty string first
+  # Keep the ordering of the master file.
+  for master_entry in itertools.chain([get_empty_string_entry()], master_file):
+    key = (master_entry.value, master_entry.context)
+    if key not in master_entries_by_value:
+      # no try + except KeyError here, this is a defaultdict
+      continue
+
+    # Get all entries with the same key and context
+    all_entries = master_entries_by_value[key]
+
+    if not len(all_entries):
+      raise Exception("len(all_entries) == 0: %s" % master_entry)
+
+    del master_entries_by_value[key]
+
+    suggestion = suggestions.get(key)
+
+    for e in all_entries:
+      yield "#. :src: %s" % e.key + linesep
+    if suggestion is not None:
+      yield "#, fuzzy" + linesep
+      yield '#| msgid "%s"' % escape_po(suggestion[1]) + linesep
+    if len(master_entry.context):
+      yield "msgctxt \"%s\"" % escape_po(master_entry.context) + linesep
+    yield 'msgid "%s"' % escape_po(master_entry.value) + linesep
+    if suggestion is not None:
+      yield 'msgstr "%s"' % escape_po(suggestion[2]) + linesep
+    elif mode == 'zusi2pot':
+      yield 'msgstr ""' + linesep
+    else:
+      yield 'msgstr "%s"' % escape_po(translations[key]) + linesep
+
+    if master_entry.key == '':
+      yield "\"Content-Type: text/plain; charset=UTF-8\\n\"" + linesep
+
+    yield linesep
+
+def write_po(outfile, mode, master_file, existing_translation, memory=None, memory_threshold=0.7):
+  """Writes a .pot (mode 'zusi2pot') or .po (mode 'zusi2po') file for the given master file."""
+  for line in iter_po(mode, master_file, existing_translation, memory, memory_threshold):
+    outfile.write(line)
+
+def iter_zusi_values(master_entries, po_file, shortcuts, shortcuts_by_key):
+  """Yields tuples (master entry, translated value including shortcut) for the given master entries
+  (any iterable, e.g. a TranslationFile or iter_zusi()) using the translations from po_file."""
+  for master_entry in master_entries:
+    translated_entry = po_file.get_translated_entry(master_entry)
+    value = translated_entry.value
+    try:
+      value = shortcuts.add_shortcut(value, shortcuts_by_key[master_entry.key])
+    except KeyError:
+      pass
+    yield (master_entry, value)
+
+def format_zusi_value(master_entry, value):
+  """Returns the text that is written after "key = " for the given master entry and translated value."""
+  return (" " * master_entry.leftspaces if "Streckenvorschau" in master_entry.key else "") + value
+
+def format_zusi_line(master_entry, value):
+  return "%s = %s" % (master_entry.key, format_zusi_value(master_entry, value)) + linesep
+
+def write_zusi(outfile, master_entries, po_file, shortcuts, shortcuts_by_key, encoding=None):
+  """Writes a Zusi translation file for the given master entries using the translations from po_file.
+  Nothing is written if one of the values cannot be encoded in the given encoding (default: the encoding
+  of outfile). master_entries is iterated twice for this, so it must not be an iterator."""
+  if encoding is None:
+    encoding = getattr(outfile, 'encoding', None)
+  errors = find_unencodable(iter_zusi_values(master_entries, po_file, shortcuts, shortcuts_by_key), encoding)
+  if len(errors):
+    raise UnencodableException(errors, encoding)
+  write_zusi_values(outfile, iter_zusi_values(master_entries, po_file, shortcuts, shortcuts_by_key))
+
+def write_zusi_values(outfile, values):
+  """Writes a Zusi translation file for the tuples (master entry, translated value) from iter_zusi_values()."""
+  for (master_entry, value) in values:
+    outfile.write(format_zusi_line(master_entry, value))
+
+def find_unencodable(values, encoding):
+  """Returns a list of tuples (master entry, value, characters) for the tuples (master entry, value) from
+  iter_zusi_values() whose line cannot be encoded in the given encoding, where characters is a string
+  of the characters that cannot be encoded. The values are looked at one at a time."""
+  if encodes_all(encoding):
+    return []
+  result = []
+  for (master_entry, value) in values:
+    line = format_zusi_line(master_entry, value)
+    try:
+      line.encode(encoding)
+    except UnicodeEncodeError:
+      characters = []
+      for c in line:
+        try:
+          c.encode(encoding)
+        except UnicodeEncodeError:
+          if c not in characters:
+            characters.append(c)
+      result.append((master_entry, value, "".join(characters)))
+  return result
+
+def encodes_all(encoding):
+  """Returns whether every text can be encoded in the given encoding (None: the output is not encoded),
+  so that find_unencodable() need not look at the values."""
+  if encoding is None:
+    return True
+  import codecs
+  try:
+    return codecs.lookup(encoding).name in unicode_encodings
+  except LookupError:
+    return False
+
 class TranslationHelper(object):
   def main(self, args):
-    contexts = {}
-    if args.context is not None:
-      for context_file in args.context:
-        logging.info("Reading context file {}".format(context_file[0].name))
-        read_context_file(context_file[0], contexts)
-
-    master_file = TranslationFile()
-    for m in args.master:
-      logging.info("Reading master translation file {}".format(m[0].name))
-      master_file.read_from_zusi(m[0], contexts, strip_shortcuts = args.strip_shortcuts)
-
-    shortcuts = ShortcutGroupFile()
+    shortcuts = ShortcutGroupFile(args.approximate_shortcuts, args.approximate_time_budget, args.compact_shortcuts)
+
+    memory = None
+    if args.memory:
+      from . import translation_memory
+      memory = translation_memory.TranslationMemory.load(args.memory)
+
+    if args.mode == 'po2zusi':
+      # Reads the contexts and shortcut groups as well
+      from . import master_index
+      self.po2zusi(args, master_index.get_index(args, shortcuts), shortcuts, memory)
+      return
+
+    contexts = read_contexts(args.context)
     if args.shortcut_groups:
       logging.info("Reading shortcut group file {}".format(args.shortcut_groups.name))
       shortcuts.read_from_file(args.shortcut_groups)
 
-    if args.mode == 'checkzusi':
-      duplicate_key_entries = defaultdict(list)
+    if args.mode == 'checkshortcuts':
+      sys.exit(self.checkshortcuts(args, shortcuts))
+    if args.mode == 'diff':
+      sys.exit(self.diff(args))
+    if args.mode in ['import', 'query']:
+      sys.exit(self.database(args, contexts))
 
-      single_source = []
-      multiple_sources = []
-      for entries in master_file.entries.values():
-        if len(entries) > 1:
-          values = set([entry.value for entry in entries])
-          (single_source if len(values) == 1 else multiple_sources).append(entries)
-
-      if len(single_source) == 0 and len(multiple_sources) == 0:
-        print("File is OK.")
-      else:
-        print("The following keys occur multiple times in the file, but with the same source text:")
-        for group in single_source:
-          print("  " + iter(group).next().key + ": '" + iter(group).next().value + "'")
-        print("The following keys occur multiple times in the file with different source text:")
-        for group in multiple_sources:
-          print("  " + iter(group).next().key + ": " + ", ".join(["'" + entry.value + "'" for entry in group]))
+    master_file = read_masters(args.master, contexts, args.strip_shortcuts, args.jobs)
 
-      sys.exit(0)
+    if args.mode == 'checkzusi':
+      sys.exit(self.checkzusi(args, master_file, shortcuts))
 
     existing_translation = TranslationFile()
     if (args.translation):
       logging.info("Reading existing translation file {}".format(args.translation.name))
-      existing_translation.read_from_zusi(args.translation, {})
-    if args.mode == 'po2zusi':
-      logging.info("Reading PO file {}".format(args.po_file.name))
-      po_file = TranslationFile().read_from_po(args.po_file)
-
-    outfile = args.out.open()
-    logging.info("Writing to output file {}".format(outfile.name))
-    master_entries_by_value = defaultdict(list)
-    for entry in master_file:
-      master_entries_by_value[(entry.value, entry.context)].append(entry)
-
-    if args.mode in ['zusi2pot', 'zusi2po']:
-      # Print the entry for the empty string first
-      master_file.entries_in_order.insert(0, get_empty_string_entry())
-
-      # Keep the ordering of the master file.
-      for master_entry in master_file:
-        key = (master_entry.value, master_entry.context)
-        if key not in master_entries_by_value:
-          # no try + except KeyError here, this is a defaultdict
-          continue
-
-        # Get all entries with the same key and context
-        all_entries = master_entries_by_value[key]
-
-        if not len(all_entries):
-          raise Exception("len(all_entries) == 0: %s" % master_entry)
-
-        del master_entries_by_value[key]
-
-        for e in all_entries:
-          outfile.write("#. :src: %s" % e.key + linesep)
-        if len(master_entry.context):
-          outfile.write("msgctxt \"%s\"" % escape_po(master_entry.context) + linesep)
-        outfile.write('msgid "%s"' % escape_po(master_entry.value) + linesep)
-        if args.mode == 'zusi2pot':
-          outfile.write('msgstr ""' + linesep)
-        else:
-          possible_translation_entries = [existing_translation[entry.key] for entry in all_entries if entry.key in existing_translation]
-          possible_translations = set([entry.value for entry in possible_translation_entries])
-          if len(possible_translations) == 1:
-            outfile.write('msgstr "%s"' % escape_po(next(iter(possible_translations))) + linesep)
-          else:
-            print("Error: %d translations found for text '%s', context '%s', with the following set of keys:"
-                % (len(possible_translations), master_entry.value, master_entry.context))
-            for entry in all_entries:
-              print("  %s" % entry.key)
-            if len(possible_translations) > 0:
-              print("Possible translations:")
-              for possible_translation in possible_translations:
-                print("  '%s'" % possible_translation)
-                for entry in possible_translation_entries:
-                  if entry.value == possible_translation:
-                    print("    %s" % entry.key)
-            sys.exit(3)
-
-        if master_entry.key == '':
-          outfile.write("\"Content-Type: text/plain; charset=UTF-8\\n\"" + linesep)
-
-        outfile.write(linesep)
-
-    elif args.mode == 'po2zusi':
-      shortcuts_by_key = shortcuts.generate_shortcuts(master_file, po_file, existing_translation)
-
-      for master_entry in master_file:
-        translated_entry = po_file.get_translated_entry(master_entry)
-        value = translated_entry.value
-        try:
-          value = shortcuts.add_shortcut(value, shortcuts_by_key[master_entry.key])
-        except KeyError:
-          pass
-        try:
-          outfile.write("%s = %s%s" % (master_entry.key, " " * master_entry.leftspaces if "Streckenvorschau" in master_entry.key else "", value) + linesep)
-        except UnicodeEncodeError as e:
-          raise TranslationException("%s = '%s' cannot be written in the specified output encoding. Error message: %s" % (master_entry.key, value, linesep + e.message))
+      read_zusi_file(args.translation, {}, jobs=args.jobs, translation_file=existing_translation)
+
+    with args.out.open() as outfile:
+      logging.info("Writing to output file {}".format(outfile.name))
+      try:
+        write_po(outfile, args.mode, master_file, existing_translation, memory, args.memory_threshold)
+      except TranslationException as e:
+        print(e.args[0])
+        sys.exit(3)
+
+    self.save_memory(memory, args.memory)
+
+  def checkzusi(self, args, master_file, shortcuts):
+    """Checks the master file for duplicate keys and the translation files given by --translations against
+    the master file. Returns the exit code."""
+    single_source = []
+    multiple_sources = []
+    for entries in master_file.entries.values():
+      if len(entries) > 1:
+        values = set([entry.value for entry in entries])
+        (single_source if len(values) == 1 else multiple_sources).append(entries)
+
+    if len(single_source) == 0 and len(multiple_sources) == 0:
+      print("File is OK.")
+    else:
+      print("The following keys occur multiple times in the file, but with the same source text:")
+      for group in single_source:
+        entry = next(iter(group))
+        print("  " + entry.key + ": '" + entry.value + "'")
+      print("The following keys occur multiple times in the file with different source text:")
+      for group in multiple_sources:
+        print("  " + next(iter(group)).key + ": " + ", ".join(["'" + entry.value + "'" for entry in group]))
+
+    if not args.translations:
+      return 0
+    from . import check
+    reports = check.check_translations(master_file, args.translations, shortcuts, args.jobs)
+    print("")
+    check.print_reports(reports, sys.stdout)
+    return 0 if all(report.ok() for report in reports) else 1
+
+  def checkshortcuts(self, args, shortcuts):
+    """Lists the keys of each shortcut group that have the same shortcut in the translation file.
+    Returns the exit code."""
+    logging.info("Reading translation file {}".format(args.translation.name))
+    collisions = shortcuts.find_collisions(iter_zusi(args.translation, {}))
+    if not len(collisions):
+      print("Shortcuts are OK.")
+      return 0
+    for (group, shortcut, keys) in collisions:
+      print("Shortcut '%s' used by: %s" % (shortcut, ", ".join(keys)))
+    print("%d shortcut collision(s) in %d group(s)" % (len(collisions), len(set(id(group) for (group, _, _) in collisions))))
+    return 1
+
+  def diff(self, args):
+    """Writes the changes between the two files given by --translations. Returns the exit code."""
+    from . import diff
+    (old_file, new_file) = args.translations
+    logging.info("Comparing {} with {}".format(old_file.name, new_file.name))
+    changes = diff.diff_entries(diff.sorted_entries(old_file), diff.sorted_entries(new_file))
+    write = diff.write_json if args.diff_format == 'json' else diff.write_text
+    if args.out is not None:
+      with args.out.open() as outfile:
+        count = write(changes, outfile)
+    else:
+      count = write(changes, sys.stdout)
+    logging.info("{} change(s)".format(count))
+    return 1 if count else 0
+
+  def database(self, args, contexts):
+    """Imports files into or queries the translation database. Returns the exit code."""
+    from . import store
+    database = store.TranslationStore(args.database)
+    try:
+      if args.mode == 'import':
+        files = [('master', m[0]) for m in (args.master or [])] \
+            + [(store.file_kind(f), f) for f in (args.translations or [])]
+        logging.info("{} of {} file(s) imported".format(database.import_files(files, contexts), len(files)))
+        return 0
+
+      for key in (args.key or []):
+        for (language, kind, value) in database.translations(key):
+          print("%s\t%s\t%s = %s" % (language, kind, key, value))
+      for source in (args.source or []):
+        for (key, context) in database.keys_with_source(source):
+          print("%s\t%s" % (key, context) if context else key)
+      for query in (args.search or []):
+        for (language, kind, key, value) in database.search(query):
+          print("%s\t%s\t%s = %s" % (language, kind, key, value))
+      return 0
+    except TranslationException as e:
+      print(e.args[0])
+      return 2
+    finally:
+      database.close()
+
+  def save_memory(self, memory, filename):
+    if memory is not None and memory.changed:
+      logging.info("Saving {} entries to translation memory {}".format(len(memory), filename))
+      memory.save(filename)
+
+  def po2zusi(self, args, index, shortcuts, memory=None):
+    """Writes one Zusi translation file per master file, using the contexts and shortcut group entries
+    of the given master_index.MasterIndex."""
+    logging.info("Reading PO file {}".format(args.po_file.name))
+    # Fuzzy entries are unreviewed suggestions, so they are neither used nor added to the memory.
+    po_file = TranslationFile().read_from_po(args.po_file, include_fuzzy=False)
+    if memory is not None:
+      for entry in po_file:
+        if not entry.fuzzy:
+          memory.add(getattr(entry, 'src_value', ''), entry.value)
+      self.save_memory(memory, args.memory)
+
+    masters = [m[0] for m in args.master]
+    contexts = index.contexts
+    existing_translation = TranslationFile()
+    if len(shortcuts.key_to_group) and args.translation:
+      logging.info("Reading existing translation file {}".format(args.translation.name))
+      for entry in iter_zusi(args.translation, {}):
+        if entry.key in shortcuts.key_to_group:
+          existing_translation.append(entry)
+    # Each master file becomes its own output file, so the shortcuts are assigned per master file
+    # (a key may occur in several master files with different texts).
+    shortcuts_by_master = [shortcuts.generate_shortcuts(None, po_file, existing_translation, candidates=candidates)
+        for candidates in index.candidates]
+
+    # The PO file is read only once for all master files.
+    # All output files are checked for characters that cannot be encoded before any of them is written.
+    # The master files are streamed once for the check and once for writing, so only the errors are kept.
+    # Unicode output encodings can encode everything, so the check pass is skipped for them.
+    errors = []
+    if not encodes_all(args.out.encoding):
+      for (master, shortcuts_by_key) in zip(masters, shortcuts_by_master):
+        logging.info("Reading master translation file {}".format(master.name))
+        errors.extend(find_unencodable(iter_zusi_values(iter_zusi(master, contexts), po_file, shortcuts, shortcuts_by_key),
+            args.out.encoding))
+        master.seek(0)
+    if len(errors):
+      print(UnencodableException(errors, args.out.encoding).args[0])
+      sys.exit(3)
+
+    for (master, shortcuts_by_key) in zip(masters, shortcuts_by_master):
+      with args.out.for_input(master.name).open() as outfile:
+        logging.info("Writing to output file {}".format(outfile.name))
+        write_zusi_values(outfile, iter_zusi_values(iter_zusi(master, contexts), po_file, shortcuts, shortcuts_by_key))
+      if args.catalog:
+        master.seek(0)
+        self.write_catalog(args.catalog.for_input(master.name).name,
+            iter_zusi_values(iter_zusi(master, contexts), po_file, shortcuts, shortcuts_by_key))
+
+  def write_catalog(self, filename, values):
+    from . import catalog
+    logging.info("Writing to catalog file {}".format(filename))
+    with open(filename, 'wb') as f:
+      catalog.write_catalog(f, ((master_entry.key, format_zusi_value(master_entry, value))
+          for (master_entry, value) in values))
@@ -0,0 +1,140 @@
+import bisect
+import json
+import logging
+import math
+import os
+from collections import defaultdict
+
+from .translation_helper import shortcut_re
+
+def normalize(text):
+  """Text used for comparing source texts: lower-cased, without keyboard shortcut markers."""
+  return shortcut_re.sub('', text).lower()
+
+def trigrams(text):
+  padded = "  " + normalize(text) + " "
+  return set([padded[i:i+3] for i in range(len(padded) - 2)])
+
+class TranslationMemory:
+  """Source texts and their translations with a trigram inverted index for fuzzy lookups.
+
+  The similarity of two texts is the Dice coefficient of their trigram sets. The memory can be saved
+  to and loaded from a JSON file (including the index), and new pairs can be added at any time."""
+
+  FORMAT = 'trans_helper translation memory'
+  VERSION = 1
+
+  def __init__(self):
+    self.sources = [] # source text by id
+    self.translations = [] # translated text by id
+    self.trigram_counts = [] # number of trigrams of the source text by id
+    self.ids = {} # source text -> id
+    self.index = defaultdict(list) # trigram -> ids of the source texts that contain it, in ascending order
+    self.changed = False
+
+  def __len__(self):
+    return len(self.sources)
+
+  def add(self, source, translation):
+    """Adds a pair of source text and translation. A later translation of the same source text
+    replaces the earlier one."""
+    if not len(source) or not len(translation):
+      return
+    try:
+      entry_id = self.ids[source]
+      if self.translations[entry_id] != translation:
+        self.translations[entry_id] = translation
+        self.changed = True
+      return
+    except KeyError:
+      pass
+    entry_id = len(self.sources)
+    self.ids[source] = entry_id
+    self.sources.append(source)
+    self.translations.append(translation)
+    source_trigrams = trigrams(source)
+    self.trigram_counts.append(len(source_trigrams))
+    for trigram in source_trigrams:
+      self.index[trigram].append(entry_id)
+    self.changed = True
+
+  def lookup(self, text, threshold=0.7):
+    """Returns a tuple (similarity, source text, translation) for the most similar source text
+    whose similarity is at least threshold, or None."""
+    if not len(text) or threshold <= 0:
+      return None
+    query = trigrams(text)
+    count = len(query)
+
+    # A source text with a similarity of at least threshold shares at least min_shared trigrams with
+    # the query, so it must contain one of the (count - min_shared + 1) rarest trigrams of the query.
+    # Only those posting lists are scanned to find candidates (prefix filtering); the other trigrams
+    # are looked up in their (sorted) posting lists for each candidate.
+    min_shared = int(math.ceil(threshold * count / (2.0 - threshold) - 1e-9))
+    min_count = threshold * count / (2.0 - threshold)
+    max_count = (2.0 - threshold) * count / threshold
+    rarest = sorted(query, key=lambda trigram: len(self.index.get(trigram, ())))
+    prefix_length = max(count - min_shared + 1, 1)
+    common = defaultdict(int)
+    for trigram in rarest[:prefix_length]:
+      for entry_id in self.index.get(trigram, ()):
+        common[entry_id] += 1
+    rest = [self.index[trigram] for trigram in rarest[prefix_length:] if trigram in self.index]
+
+    best = None
+    best_similarity = threshold
+    for entry_id in sorted(common):
+      entry_count = self.trigram_counts[entry_id]
+      if entry_count < min_count or entry_count > max_count:
+        continue
+      shared = common[entry_id]
+      needed = best_similarity * (count + entry_count) / 2.0
+      remaining = len(rest)
+      for postings in rest:
+        if shared + remaining < needed:
+          break
+        remaining -= 1
+        i = bisect.bisect_left(postings, entry_id)
+        if i < len(postings) and postings[i] == entry_id:
+          shared += 1
+      similarity = 2.0 * shared / (count + entry_count)
+      if similarity > best_similarity or (similarity == best_similarity and best is None):
+        best = entry_id
+        best_similarity = similarity
+    if best is None:
+      return None
+    return (best_similarity, self.sources[best], self.translations[best])
+
+  def save(self, filename):
+    data = {
+      'format': self.FORMAT,
+      'version': self.VERSION,
+      'entries': [[s, t] for (s, t) in zip(self.sources, self.translations)],
+      'index': self.index,
+    }
+    with open(filename + '.tmp', 'w', encoding='UTF-8') as f:
+      json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(filename + '.tmp', filename)
+    self.changed = False
+
+  @classmethod
+  def load(cls, filename):
+    """Loads a memory from the given file, or returns an empty memory if the file does not exist."""
+    memory = cls()
+    if not os.path.exists(filename):
+      return memory
+    with open(filename, encoding='UTF-8') as f:
+      data = json.load(f)
+    if data.get('format') != cls.FORMAT or data.get('version') != cls.VERSION:
+      raise ValueError("%s is not a translation memory file" % filename)
+    for (source, translation) in data['entries']:
+      memory.ids[source] = len(memory.sources)
+      memory.sources.append(source)
+      memory.translations.append(translation)
+    memory.trigram_counts = [0] * len(memory.sources)
+    for (trigram, ids) in data['index'].items():
+      memory.index[trigram] = ids
+      for entry_id in ids:
+        memory.trigram_counts[entry_id] += 1
+    logging.info("Loaded {} entries from translation memory {}".format(len(memory), filename))
+    return memory
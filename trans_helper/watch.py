@@ -0,0 +1,168 @@
+import ctypes
+import ctypes.util
+import io
+import logging
+import os
+import select
+import time
+
+from . import myargparse
+from . import translation_helper
+
+class _Inotify(object):
+  """Minimal inotify binding (Linux only) that wakes up when a file in one of the watched directories is written."""
+  IN_CLOSE_WRITE = 0x00000008
+  IN_MOVED_TO = 0x00000080
+  IN_CREATE = 0x00000100
+
+  def __init__(self, directories):
+    libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    self._fd = libc.inotify_init()
+    if self._fd < 0:
+      raise OSError(ctypes.get_errno(), "inotify_init failed")
+    for directory in directories:
+      if libc.inotify_add_watch(self._fd, os.fsencode(directory),
+          self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE) < 0:
+        raise OSError(ctypes.get_errno(), "inotify_add_watch failed for %s" % directory)
+
+  def wait(self, timeout):
+    (ready, _, _) = select.select([self._fd], [], [], timeout)
+    if ready:
+      os.read(self._fd, 65536)
+
+class _Polling(object):
+  def wait(self, timeout):
+    time.sleep(timeout)
+
+class WatchedFile(object):
+  """An input file that is re-read with the given reader function whenever its modification time changes."""
+
+  def __init__(self, f, reader):
+    self.name = f.name
+    self.encoding = getattr(f, 'encoding', 'UTF-8')
+    self.reader = reader
+    self.mtime = None
+    self.value = None
+    f.close()
+
+  def invalidate(self):
+    self.mtime = None
+
+  def refresh(self):
+    """Re-reads the file if it changed. Returns True if the file was re-read."""
+    try:
+      mtime = os.stat(self.name).st_mtime_ns
+    except OSError:
+      # Editors may replace the file while saving; try again later.
+      return False
+    if mtime == self.mtime:
+      return False
+    logging.info("Reading {}".format(self.name))
+    with myargparse.open_file(self.name, 'r', self.encoding) as f:
+      self.value = self.reader(f)
+    self.mtime = mtime
+    return True
+
+class Watcher(object):
+  """Regenerates the output file of a zusi2pot/zusi2po/po2zusi run whenever one of its input files changes.
+  Only changed files are parsed again, and shortcut groups whose entries did not change keep their
+  previous assignment."""
+
+  def __init__(self, args, interval=0.2):
+    self.args = args
+    self.interval = interval
+    self.contexts = {}
+    from . import assignment
+    self.shortcut_cache = assignment.LRUCache()
+    self.last_output = None
+
+    self.context_files = [WatchedFile(c[0], self._read_context_file) for c in (args.context or [])]
+    self.master_files = [WatchedFile(m[0], self._read_master_file) for m in args.master]
+    self.translation = WatchedFile(args.translation,
+        lambda f: translation_helper.TranslationFile().read_from_zusi(f, {})) if args.translation else None
+    self.po_file = WatchedFile(args.po_file,
+        lambda f: translation_helper.TranslationFile().read_from_po(f, include_fuzzy=False)) if args.po_file and args.mode == 'po2zusi' else None
+    self.shortcut_groups = WatchedFile(args.shortcut_groups, self._read_shortcut_groups) \
+        if args.shortcut_groups and args.mode == 'po2zusi' else None
+
+  def _read_context_file(self, f):
+    contexts = {}
+    translation_helper.read_context_file(f, contexts)
+    return contexts
+
+  def _read_master_file(self, f):
+    return translation_helper.TranslationFile().read_from_zusi(f, self.contexts,
+        strip_shortcuts = self.args.strip_shortcuts)
+
+  def _read_shortcut_groups(self, f):
+    shortcuts = translation_helper.ShortcutGroupFile(self.args.approximate_shortcuts,
+        self.args.approximate_time_budget, self.args.compact_shortcuts)
+    shortcuts.read_from_file(f)
+    return shortcuts
+
+  def _input_files(self):
+    return [f for f in self.context_files + self.master_files + [self.translation, self.po_file, self.shortcut_groups]
+        if f is not None]
+
+  def refresh(self):
+    """Re-reads all changed input files. Returns True if the output has to be regenerated."""
+    changed = False
+    if any([f.refresh() for f in self.context_files]):
+      self.contexts = {}
+      for f in self.context_files:
+        self.contexts.update(f.value)
+      # Contexts are stored in the master entries.
+      for f in self.master_files:
+        f.invalidate()
+      changed = True
+    return any([f.refresh() for f in self._input_files()]) or changed
+
+  def regenerate(self):
+    master_file = translation_helper.TranslationFile()
+    for f in self.master_files:
+      for entry in f.value:
+        master_file.append(entry)
+    existing_translation = self.translation.value if self.translation else translation_helper.TranslationFile()
+
+    out = io.StringIO()
+    if self.args.mode == 'po2zusi':
+      shortcuts = self.shortcut_groups.value if self.shortcut_groups else translation_helper.ShortcutGroupFile()
+      shortcuts_by_key = shortcuts.generate_shortcuts(master_file, self.po_file.value, existing_translation,
+          cache=self.shortcut_cache)
+      # The output is collected in a StringIO, so check it against the encoding of the real output file.
+      translation_helper.write_zusi(out, master_file, self.po_file.value, shortcuts, shortcuts_by_key,
+          encoding=self.args.out.encoding)
+    else:
+      translation_helper.write_po(out, self.args.mode, master_file, existing_translation)
+
+    output = out.getvalue()
+    if output == self.last_output:
+      logging.info("Output unchanged")
+      return
+    outfile = self.args.out.open()
+    try:
+      logging.info("Writing to output file {}".format(outfile.name))
+      outfile.write(output)
+    finally:
+      outfile.close()
+    self.last_output = output
+
+  def run(self):
+    directories = set([os.path.dirname(os.path.abspath(f.name)) for f in self._input_files()])
+    try:
+      waiter = _Inotify(directories)
+    except (OSError, AttributeError, TypeError):
+      logging.info("inotify not available, polling for changes")
+      waiter = _Polling()
+
+    logging.info("Watching for changes, press Ctrl+C to stop")
+    try:
+      while True:
+        if self.refresh():
+          try:
+            self.regenerate()
+          except translation_helper.TranslationException as e:
+            logging.error(e.args[0])
+        waiter.wait(self.interval)
+    except KeyboardInterrupt:
+      pass